@@ -1,64 +1,288 @@
+import copy
 import shelve
-from itertools import chain
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 
-from fn_helper import SpotifyClient
-from archives import all_recipes
+from fn_helper import PoolIndex, SpotifyClient, SpotifyNerdPlaylistIterator
+from fn_helper.util import chunk_gen
+from archives import load_recipes
 
+# Sources whose tracks are fetched in parallel.
+FETCH_WORKERS = 4
 
-def _archive_playlists():
-    spotify_client = SpotifyClient()
+
+class SourceFetcher:
+    """ Fetches source tracks on a thread pool. Sources shared by several
+        recipes are only fetched once.
+    """
+
+    def __init__(self, max_workers=FETCH_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, source):
+        with self.lock:
+            if id(source) not in self.futures:
+                self.futures[id(source)] = self.executor.submit(
+                    lambda: source.tracks)
+            return self.futures[id(source)]
+
+    def map(self, sources):
+        """ Yields `(source, tracks)` in order while later sources are still
+            being fetched.
+        """
+        futures = [self.fetch(source) for source in sources]
+        for source, future in zip(sources, futures):
+            yield source, future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class ArchiveProgress:
+    """ Tracks which archived sources have been fully written to every
+        target, and persists each recipe's checkpoint as soon as it advances.
+    """
+
+    def __init__(self, checkpoints):
+        self.checkpoints = checkpoints
+        # recipe name -> {source seq: tracks not yet written}
+        self.pending = {}
+        # recipe name -> [(source seq, checkpoint)] not yet persisted
+        self.done_sources = {}
+        self.lock = threading.Lock()
+
+    def enqueue(self, recipe_name, seq, count):
+        with self.lock:
+            pending = self.pending.setdefault(recipe_name, {})
+            pending[seq] = pending.get(seq, 0) + count
+
+    def written(self, recipe_name, seq, count):
+        with self.lock:
+            self.pending[recipe_name][seq] -= count
+            self._advance(recipe_name)
+
+    def source_done(self, recipe_name, seq, checkpoint):
+        with self.lock:
+            self.done_sources.setdefault(recipe_name, []).append(
+                (seq, checkpoint))
+            self._advance(recipe_name)
+
+    def _advance(self, recipe_name):
+        done_sources = self.done_sources.get(recipe_name, [])
+        pending = self.pending.get(recipe_name, {})
+        checkpoint = None
+        while done_sources and not pending.get(done_sources[0][0]):
+            seq, checkpoint = done_sources.pop(0)
+            pending.pop(seq, None)
+        if checkpoint is not None:
+            self.checkpoints[recipe_name] = checkpoint
+            self.checkpoints.sync()
+
+
+class TargetWriter:
+    """ Buffers tracks for a target playlist and writes them out as soon as
+        a full batch is ready. Membership is read once so tracks already in
+        the playlist are never written again, e.g. when resuming a crashed
+        run. The pool's membership comes from the pool index, other targets
+        are read through the track cache, which is extended with the written
+        tracks so the next run does not download the whole playlist again.
+    """
+
+    def __init__(self, spotify_client, playlist_id, progress,
+                 pool_index=None):
+        self.spotify_client = spotify_client
+        self.playlist_id = playlist_id
+        self.progress = progress
+        self.pool_index = pool_index
+        self.present = None
+        # Cached listing of a non-pool target and what was appended since.
+        self.tracks = None
+        self.appended = 0
+        self.snapshot_id = None
+        # [(track uri, (recipe name, source seq))]
+        self.buffer = []
+        self.lock = threading.Lock()
+
+    def _load_present(self):
+        if self.pool_index is not None:
+            self.pool_index.sync(self.spotify_client)
+            self.present = self.pool_index.track_uris()
+            return
+        self.tracks = []
+        self.present = set()
+        for item in self.spotify_client.iter_tracks_in_playlist(
+                self.playlist_id):
+            self.tracks.append(item)
+            if item and item.get('track'):
+                self.present.add(item['track']['uri'])
+
+    def add(self, track_uris, recipe_name, seq):
+        with self.lock:
+            if self.present is None:
+                self._load_present()
+            new_uris = []
+            for uri in track_uris:
+                if uri not in self.present:
+                    self.present.add(uri)
+                    new_uris.append(uri)
+            self.progress.enqueue(recipe_name, seq, len(new_uris))
+            self.buffer.extend((uri, (recipe_name, seq)) for uri in new_uris)
+            if len(self.buffer) >= 100:
+                self._write(len(self.buffer) - len(self.buffer) % 100)
+
+    def flush(self):
+        with self.lock:
+            self._write(len(self.buffer))
+            if self.tracks is not None and self.appended:
+                self.tracks = self.spotify_client.cache_appended_tracks(
+                    self.playlist_id, self.tracks, self.appended,
+                    self.snapshot_id)
+                self.appended = 0
+
+    def _write(self, size):
+        batch, self.buffer = self.buffer[:size], self.buffer[size:]
+        for chunk in chunk_gen(batch):
+            self.snapshot_id = self.spotify_client.add_tracks_to_playlist(
+                [uri for uri, _ in chunk], self.playlist_id)
+            self.appended += len(chunk)
+            written = {}
+            for _, tag in chunk:
+                written[tag] = written.get(tag, 0) + 1
+            for (recipe_name, seq), count in written.items():
+                self.progress.written(recipe_name, seq, count)
+
+
+class ArchiveExecutor:
+    """ Runs recipes concurrently over one SpotifyClient. Recipes reading the
+        same source share its elements and fetched tracks, and tracks are
+        streamed to the shared target writers.
+    """
+
+    def __init__(self, spotify_client, checkpoints):
+        self.spotify_client = spotify_client
+        self.progress = ArchiveProgress(checkpoints)
+        self.fetcher = SourceFetcher()
+        self.sources = {}
+        self.writers = {}
+        self.pool_index = PoolIndex()
+        self.lock = threading.Lock()
+
+    def source_for(self, recipe):
+        """ Returns a fresh iterator over the shared elements of the recipe's
+            source factory.
+        """
+        factory = recipe.source_factory
+        with self.lock:
+            if factory not in self.sources:
+                if factory is SpotifyNerdPlaylistIterator:
+                    self.sources[factory] = factory(
+                        spotify_client=self.spotify_client)
+                else:
+                    self.sources[factory] = factory()
+        return copy.copy(self.sources[factory])
+
+    def writer_for(self, playlist_id):
+        with self.lock:
+            if playlist_id not in self.writers:
+                pool_index = (
+                    self.pool_index
+                    if playlist_id == self.pool_index.pool_playlist_id
+                    else None)
+                self.writers[playlist_id] = TargetWriter(
+                    self.spotify_client, playlist_id, self.progress,
+                    pool_index)
+            return self.writers[playlist_id]
+
+    def run_recipe(self, recipe, checkpoint):
+        """ Archives the sources after the checkpoint. The checkpoint is
+            advanced as the sources are completely written.
+        """
+        recipe._source = self.source_for(recipe)
+        recipe.source.move_to_checkpoint(checkpoint)
+
+        used_writers = set()
+        sources = list(recipe.source)
+        for seq, (source, tracks) in enumerate(self.fetcher.map(sources)):
+            writes = {}
+            tags = recipe.filter_tracks(tracks, source)
+            for track, result in zip(tracks, tags):
+                if not result:
+                    continue
+
+                if not isinstance(result, list):
+                    result = [result]
+                for tag in result:
+                    if isinstance(recipe.target, dict):
+                        if tag not in recipe.target:
+                            continue
+                        playlist_id = recipe.target[tag]
+                    else:
+                        playlist_id = recipe.target
+                    writes.setdefault(playlist_id, []).append(
+                        track.spotify_uri)
+
+            for playlist_id, track_uris in writes.items():
+                writer = self.writer_for(playlist_id)
+                writer.add(track_uris, recipe.name, seq)
+                used_writers.add(writer)
+            self.progress.source_done(
+                recipe.name, seq, recipe.source.checkpoint_of(source))
+
+        for writer in used_writers:
+            writer.flush()
+
+    def run(self, recipes):
+        """ Runs the recipes concurrently. Returns the recipes that failed,
+            mapped to their error.
+        """
+        checkpoints = self.progress.checkpoints
+        starting_checkpoints = [
+            checkpoints.get(recipe.name)
+            or getattr(recipe, 'initial_checkpoint', None)
+            for recipe in recipes]
+        with ThreadPoolExecutor(max_workers=max(len(recipes), 1)) as pool:
+            futures = [
+                pool.submit(self.run_recipe, recipe, checkpoint)
+                for recipe, checkpoint in zip(recipes, starting_checkpoints)]
+        self.fetcher.shutdown()
+
+        failures = {}
+        for recipe, future in zip(recipes, futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"{recipe.name}: {e}")
+                failures[recipe] = e
+        return failures
+
+
+def _archive_playlists(spotify_client=None, source_factories=None):
+    """ Runs the active recipes, or only those reading one of
+        `source_factories` when given. Returns the failed recipes mapped to
+        their error.
+    """
+    spotify_client = spotify_client or SpotifyClient()
 
     checkpoints = shelve.open('archive_checkpoints.db', writeback=True)
 
-    for Recipe in all_recipes:
-        try:
-            recipe = Recipe()
-
-            if not recipe.active:
-                continue
-            recipe_name = recipe.name
-
-            checkpoint = (checkpoints.get(recipe_name)
-                          or getattr(recipe, 'initial_checkpoint', None))
-            recipe.source.move_to_checkpoint(checkpoint)
-
-            results = {}
-            while True:
-                try:
-                    source = next(recipe.source)
-                except StopIteration:
-                    break
-                for track in source.tracks:
-                    result = recipe.track_filter(track, source)
-                    if not result:
-                        continue
-
-                    if not isinstance(result, list):
-                        result = [result]
-                    for tag in result:
-                        results.setdefault(
-                            tag, []).append(track.spotify_uri)
-
-            if isinstance(recipe.target, dict):
-                for tag, track_uris in results.items():
-                    if tag not in recipe.target:
-                        continue
-                    spotify_client.add_tracks_to_playlist(
-                        track_uris, recipe.target[tag])
-            else:
-                spotify_client.add_tracks_to_playlist(
-                    list(chain.from_iterable(results.values())), recipe.target)
-
-            checkpoints[recipe_name] = recipe.source.checkpoint
-        except Exception as e:
-            print(e)
-            pass
+    recipes = [Recipe() for Recipe in load_recipes()]
+    recipes = [recipe for recipe in recipes if recipe.active and (
+        source_factories is None
+        or recipe.source_factory in source_factories)]
+    executor = ArchiveExecutor(spotify_client, checkpoints)
+    failures = executor.run(recipes)
 
     checkpoints.sync()
     checkpoints.close()
 
+    # Keep the duplicate detection index current with what was archived.
+    executor.pool_index.sync(spotify_client)
+    return failures
+
 
 @click.command()
 def archive_playlists():
@@ -1,9 +1,25 @@
 import importlib
+import os.path
 import pkgutil
 
 from .base import BaseArchiveRecipe
 
-for (module_loader, name, ispkg) in pkgutil.iter_modules(["archives"]):
-    importlib.import_module('.' + name, __package__)
+_recipes = None
 
-all_recipes = {cls for cls in BaseArchiveRecipe.__subclasses__()}
+
+def load_recipes():
+    """ Imports the recipe modules on first use and returns the recipes.
+    """
+    global _recipes
+    if _recipes is None:
+        path = os.path.dirname(__file__)
+        for (module_loader, name, ispkg) in pkgutil.iter_modules([path]):
+            importlib.import_module('.' + name, __package__)
+        _recipes = {cls for cls in BaseArchiveRecipe.__subclasses__()}
+    return _recipes
+
+
+def __getattr__(name):
+    if name == 'all_recipes':
+        return load_recipes()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
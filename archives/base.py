@@ -1,9 +1,55 @@
+COLUMNS = ('id', 'name', 'submitted_by', 'score', 'spotify_uri')
+# Music League tracks carry their Spotify ID as `spotify_id`.
+FALLBACK_ATTRS = {'id': 'spotify_id'}
+
+
+def _column_value(track, column):
+    value = getattr(track, column, None)
+    if value is None and column in FALLBACK_ATTRS:
+        value = getattr(track, FALLBACK_ATTRS[column], None)
+    return value
+
+
+def track_columns(tracks):
+    """ The tracks of a source as columns, e.g. `columns['score'][i]` is the
+        score of the i-th track. Scores are None for Spotify playlist tracks.
+    """
+    return {column: [_column_value(track, column) for track in tracks]
+            for column in COLUMNS}
+
+
 class BaseArchiveRecipe(object):
     name = None
     active = False
     initial_checkpoint = None
-    source = None
+    # Factory (e.g. `MLRoundIterator`) called once the recipe is selected, so
+    # inactive recipes never touch the network.
+    source_factory = None
     target = None
 
+    _source = None
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = self.source_factory()
+        return self._source
+
+    def batch_filter(self, columns, source):
+        """ Tags for all tracks of the source at once, one `track_filter`
+            result per track, from `track_columns`. Returning None falls back
+            to calling `track_filter` per track.
+        """
+        return None
+
     def track_filter(self, track, source):
         return True
+
+    def filter_tracks(self, tracks, source):
+        tags = None
+        # Columns are only built for recipes that read them.
+        if type(self).batch_filter is not BaseArchiveRecipe.batch_filter:
+            tags = self.batch_filter(track_columns(tracks), source)
+        if tags is None:
+            tags = [self.track_filter(track, source) for track in tracks]
+        return tags
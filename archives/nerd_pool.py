@@ -8,7 +8,7 @@ class MLArchiveRecipe(BaseArchiveRecipe):
     name = "MusicLeague_archiver"
     active = False
     initial_checkpoint = "11/3肥宅聽歌團 - Round 8 - 我知道你沒聽過，但希望你會喜歡"  # noqa
-    source = MLRoundIterator()
+    source_factory = MLRoundIterator
     target = {
         m['ml_handle']: id_from_uri(m['archive_uri'])
         for m in config["MEMBERS"] if 'ml_handle' in m}
@@ -22,7 +22,7 @@ class SpotifyArchiveRecipe(BaseArchiveRecipe):
     name = "Spotify_nerd_archiver"
     active = False
     initial_checkpoint = "11/06肥宅聽歌團"
-    source = SpotifyNerdPlaylistIterator()
+    source_factory = SpotifyNerdPlaylistIterator
     target = {
         id_from_uri(m['uri']): id_from_uri(m['archive_uri'])
         for m in config["MEMBERS"]}
@@ -7,10 +7,11 @@ class MLTop50PercentArchiveRecipe(BaseArchiveRecipe):
     name = "MusicLeague_top_rankers"
     active = False
     initial_checkpoint = "11/17肥宅聽歌團 - Round 10 - 凌晨四點想睡但真的睡不著"  # noqa
-    source = MLRoundIterator()
+    source_factory = MLRoundIterator
     target = "6Ug5S08Pyduh5rfPVKME5m"
 
-    def track_filter(self, track, source):
-        round_total = sum(dict(source.result.vote_count).values())
-        average_score = round_total / len(source.tracks)
-        return track.score >= average_score
+    def batch_filter(self, columns, source):
+        if not columns['score']:
+            return []
+        average_score = source.result.total_score / len(columns['score'])
+        return [score >= average_score for score in columns['score']]
@@ -0,0 +1,121 @@
+""" Import-time benchmark of the music_helper entry points. Every module is
+    imported in a fresh interpreter with `-X importtime`, from a directory
+    without a config.yml, and fails when it pulls in dependencies it does not
+    need or got slower than the baseline in `import_baseline.json`.
+
+    python benchmarks/import_bench.py [--repeat N]
+        [--save-baseline benchmarks/import_baseline.json]
+        [--baseline import_baseline.json] [--tolerance 0.5]
+"""
+import argparse
+import json
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'import_baseline.json')
+# Slowdowns up to this many milliseconds are noise, whatever the tolerance.
+MIN_SLACK_MS = 5
+
+# Module -> top-level packages it must not import.
+TARGETS = {
+    'music_helper': {'flask', 'bs4', 'lxml', 'browser_cookie3', 'yaml',
+                     'requests'},
+    'fn_helper': {'flask', 'bs4', 'lxml', 'browser_cookie3', 'yaml',
+                  'requests'},
+    'history': {'flask', 'bs4', 'lxml', 'browser_cookie3', 'requests'},
+    'shuffle_playlist': {'flask', 'bs4', 'lxml', 'browser_cookie3'},
+    'check_dup': {'flask', 'bs4', 'lxml', 'browser_cookie3'},
+    'round_result': {'flask', 'bs4', 'lxml', 'browser_cookie3'},
+    'archive_playlists': {'flask', 'bs4', 'lxml', 'browser_cookie3'},
+}
+
+
+def import_once(module, workdir):
+    """ Returns the cumulative import time of the module in microseconds and
+        the top-level packages imported along with it.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    cumulative = None
+    packages = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total, name = line.split('|')
+        name = name.strip()
+        packages.add(name.split('.')[0])
+        if name == module:
+            cumulative = int(total)
+    return cumulative, packages
+
+
+def measure(module, repeat, workdir):
+    best = None
+    for _ in range(repeat):
+        cumulative, packages = import_once(module, workdir)
+        best = cumulative if best is None else min(best, cumulative)
+    return {'ms': round(best / 1000, 2),
+            'unwanted': sorted(packages & TARGETS[module])}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--baseline', default=BASELINE,
+                            help="Pass an empty value to skip the check.")
+    arg_parser.add_argument('--save-baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.5,
+                            help="Allowed slowdown over the baseline.")
+    args = arg_parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = []
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for module in TARGETS:
+            try:
+                result = measure(module, args.repeat, workdir)
+            except RuntimeError as e:
+                failures.append(module)
+                print(f"{module:20} failed to import: {e}")
+                continue
+            results[module] = result
+            line = f"{module:20} {result['ms']:8.2f} ms"
+            if result['unwanted']:
+                failures.append(module)
+                line += f"  imports {', '.join(result['unwanted'])}"
+            limit = baseline.get(module)
+            if limit is not None:
+                limit = max(limit * (1 + args.tolerance),
+                            limit + MIN_SLACK_MS)
+                if result['ms'] > limit:
+                    failures.append(module)
+                    line += f"  slower than {limit:.2f} ms"
+            print(line)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({module: result['ms']
+                       for module, result in results.items()}, f, indent=2)
+            f.write("\n")
+
+    if failures:
+        print(f"Import regressions in {', '.join(sorted(set(failures)))}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
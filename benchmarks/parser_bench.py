@@ -0,0 +1,49 @@
+""" Compares the Music League parser backends over the saved fixtures.
+
+    python benchmarks/parser_bench.py [--repeat N]
+"""
+import argparse
+import os.path
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fn_helper.ml_parsers import PARSER_BACKENDS  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--repeat', type=int, default=200)
+    args = arg_parser.parse_args()
+
+    pages = {'league': load_fixture('league.html'),
+             'round': load_fixture('round.html')}
+    results = {}
+    for name, Backend in PARSER_BACKENDS.items():
+        try:
+            backend = Backend()
+        except ImportError as e:
+            print(f"{name}: skipped ({e})")
+            continue
+        results[name] = (backend.parse_league(pages['league']),
+                         backend.parse_round(pages['round']))
+        for page, text in pages.items():
+            parse = getattr(backend, f'parse_{page}')
+            elapsed = timeit.timeit(lambda: parse(text), number=args.repeat)
+            print(f"{name:12} {page:7} {elapsed / args.repeat * 1000:8.3f} ms")
+
+    outputs = list(results.values())
+    if any(output != outputs[0] for output in outputs[1:]):
+        sys.exit("Parser backends disagree on the fixtures output.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+""" End-to-end benchmarks of the music_helper commands against the offline
+    stand-in server. Each command is run cold (empty local caches) and warm,
+    and its wall time and request counts are reported.
+
+    python benchmarks/run_benchmarks.py [--pool-size N] [--latency S]
+        [--rate-limit-ratio R] [--output results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import os.path
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from standin_server import LEAGUE_ID, StandinData, start_server  # noqa: E402
+
+
+def write_config(data):
+    members = [{
+        'name': member,
+        'nickname': member.title(),
+        'uri': f'spotify:user:{member}',
+        'archive_uri': f'spotify:playlist:{data.archive_ids[member]}',
+        'ml_handle': member,
+    } for member in data.members]
+    config = {
+        'BROWSER_NAME': 'chrome',
+        'APP_CLIENT_ID': 'benchmark',
+        'APP_CLIENT_SECRET': 'benchmark',
+        'OAUTH_CLIENT_HOST': '127.0.0.1',
+        'OAUTH_CLIENT_PORT': '7000',
+        'SCOPE': ['playlist-modify-public'],
+        'ALL_POOL': f'spotify:playlist:{data.pool_id}',
+        'MUSIC_LEAGUE_ID': LEAGUE_ID,
+        'MEMBERS': members,
+    }
+    with open('config.yml', 'w') as f:
+        json.dump(config, f)  # JSON is valid YAML
+
+
+def write_token():
+    with open('oauth2_token.json', 'w') as f:
+        json.dump({
+            'access_token': 'benchmark',
+            'refresh_token': 'benchmark',
+            'scope': ['playlist-modify-public'],
+            'expiry': (datetime.now() + timedelta(hours=1)).timestamp(),
+        }, f)
+
+
+def point_clients_at(server):
+    """ Redirects the clients to the stand-in server.
+    """
+    import browser_cookie3
+    import requests
+    from fn_helper import musicleague_util, spotify_util
+
+    for endpoint, url in spotify_util.URLS.items():
+        spotify_util.URLS[endpoint] = (
+            url.replace('https://api.spotify.com', server.base_url)
+               .replace('https://accounts.spotify.com', server.base_url))
+    musicleague_util.MUSIC_LEAGUE_URL = server.base_url
+    # The stand-in server needs no login cookies.
+    browser_cookie3.chrome = (
+        lambda domain_name=None: requests.cookies.RequestsCookieJar())
+
+
+def reset_caches():
+    for name in os.listdir('.'):
+        if name.startswith(('spotify_cache', 'archive_checkpoints')):
+            os.remove(name)
+    from fn_helper.playlist_directory import PlaylistDirectory
+    PlaylistDirectory._shared = None
+
+
+def activate_recipes(data):
+    from archives import load_recipes
+    from archives.the_top_50s import MLTop50PercentArchiveRecipe
+    for Recipe in load_recipes():
+        Recipe.active = True
+        Recipe.initial_checkpoint = None
+    # Write to the stand-in's playlist instead of the real target.
+    MLTop50PercentArchiveRecipe.target = data.top_rankers_id
+
+
+def archive_playlists():
+    """ Runs `archive-playlists`, raising when a recipe failed, as the
+        command itself only prints recipe errors.
+    """
+    from archive_playlists import _archive_playlists
+
+    failures = _archive_playlists()
+    if failures:
+        raise RuntimeError("; ".join(
+            f"{recipe.name}: {error!r}"
+            for recipe, error in failures.items()))
+
+
+def scenarios(data, server):
+    from check_dup import _check_dup
+    from round_result import _round_result
+    from shuffle_playlist import _shuffle_playlist
+
+    nerd_playlist = data.playlists[data.nerd_playlist_ids[0]]['name']
+    round_url = f'{server.base_url}/l/{LEAGUE_ID}/{data.rounds[0]["id"]}/results/'  # noqa
+    return [
+        ('check-dup', lambda: _check_dup(nerd_playlist)),
+        ('shuffle-playlist', lambda: _shuffle_playlist(
+            f'spotify:playlist:{data.shuffle_id}')),
+        ('round-result', lambda: _round_result(round_url)),
+        ('archive-playlists', archive_playlists),
+    ]
+
+
+def run(server, name, fn):
+    server.reset_counts()
+    started = time.perf_counter()
+    error = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            fn()
+        except Exception as e:
+            error = repr(e)
+    return {
+        'command': name,
+        'wall_time': round(time.perf_counter() - started, 4),
+        'requests': sum(server.counts.values()),
+        'requests_by_endpoint': dict(sorted(server.counts.items())),
+        'bytes': server.bytes_sent,
+        'error': error,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--pool-size', type=int, default=10000)
+    arg_parser.add_argument('--latency', type=float, default=0.02)
+    arg_parser.add_argument('--rate-limit-ratio', type=float, default=0.0)
+    arg_parser.add_argument('--output')
+    args = arg_parser.parse_args()
+
+    data = StandinData(pool_size=args.pool_size)
+    server = start_server(data, latency=args.latency,
+                          rate_limit_ratio=args.rate_limit_ratio,
+                          retry_after=0)
+    output = os.path.abspath(args.output) if args.output else None
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        write_config(data)
+        write_token()
+        point_clients_at(server)
+        activate_recipes(data)
+
+        for name, fn in scenarios(data, server):
+            reset_caches()
+            for phase in ('cold', 'warm'):
+                result = run(server, name, fn)
+                result['phase'] = phase
+                results.append(result)
+                print(f"{name:18} {phase:4} {result['wall_time']:8.3f}s "
+                      f"{result['requests']:6} requests"
+                      + (f"  {result['error']}" if result['error'] else ''))
+        os.chdir(ROOT)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+""" Offline stand-in for the Spotify Web API and Music League pages.
+
+    Serves the endpoints in `fn_helper.spotify_util.URLS` and the league and
+    round results pages over synthetic data, with configurable latency and
+    429 injection. Run it on its own with:
+
+    python benchmarks/standin_server.py --port 8765 --pool-size 10000
+"""
+import argparse
+import html
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from uuid import uuid4
+
+ALPHABET = ('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+            '0123456789')
+LEAGUE_ID = 'league1'
+
+
+def _spotify_id(rng):
+    return ''.join(rng.choice(ALPHABET) for _ in range(22))
+
+
+class StandinData:
+    """ Synthetic playlists and league history.
+    """
+
+    def __init__(self, members=8, pool_size=10000, nerd_playlists=12,
+                 nerd_playlist_size=24, rounds=12, seed=0):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.members = [f'member{i}' for i in range(members)]
+        self.owner = self.members[0]
+        self.playlists = {}
+        self.catalog = [self._new_track(i) for i in range(
+            pool_size + nerd_playlists * nerd_playlist_size
+            + rounds * members)]
+
+        self.pool_id = self.add_playlist(
+            'ALL POOL', self.catalog[:pool_size], self.owner)
+        self.archive_ids = {
+            member: self.add_playlist(f'Archive - {member}', [], member)
+            for member in self.members}
+        self.top_rankers_id = self.add_playlist('Top Rankers', [], self.owner)
+        self.shuffle_id = self.add_playlist(
+            'Shuffle Me', self.catalog[:500], self.owner)
+
+        fresh = iter(self.catalog[pool_size:])
+        self.nerd_playlist_ids = []
+        for i in range(nerd_playlists):
+            tracks = [next(fresh) for _ in range(nerd_playlist_size)]
+            # Half of the picks are already in the pool.
+            tracks[::2] = self.rng.sample(
+                self.catalog[:pool_size], len(tracks[::2]))
+            self.nerd_playlist_ids.append(self.add_playlist(
+                f'{i % 12 + 1:02d}/{i % 28 + 1:02d}肥宅聽歌團', tracks,
+                self.owner,
+                added_by=[self.members[n % members]
+                          for n in range(len(tracks))]))
+
+        self.rounds = []
+        for r in range(rounds):
+            songs = []
+            for n, member in enumerate(self.members):
+                track = next(fresh)
+                voters = self.rng.sample(self.members, 4)
+                songs.append({
+                    'track': track, 'submitter': member,
+                    'upvotes': [(v, self.rng.randint(1, 4)) for v in voters],
+                    'comments': [(v, f'Comment by {v}') for v in voters[:2]],
+                })
+            self.rounds.append({
+                'id': f'round{r + 1}',
+                'title': f'{r % 12 + 1:02d}/01肥宅聽歌團 - Round {r + 1} - '
+                         f'Theme {r + 1}',
+                'songs': songs,
+            })
+
+    def _new_track(self, i):
+        track_id = _spotify_id(self.rng)
+        return {
+            'id': track_id,
+            'name': f'Song {i}',
+            'uri': f'spotify:track:{track_id}',
+            'artists': [{'name': f'Artist {i % 997}'}],
+            'external_ids': {'isrc': f'TW{i:010d}'},
+        }
+
+    def add_playlist(self, name, tracks, owner, added_by=None):
+        playlist_id = _spotify_id(self.rng)
+        added_by = added_by or [owner] * len(tracks)
+        self.playlists[playlist_id] = {
+            'id': playlist_id,
+            'name': name,
+            'owner': owner,
+            'snapshot_id': uuid4().hex,
+            'items': [{'added_by': {'id': a}, 'track': t}
+                      for a, t in zip(added_by, tracks)],
+        }
+        return playlist_id
+
+    def summary(self, playlist):
+        return {'id': playlist['id'], 'name': playlist['name'],
+                'snapshot_id': playlist['snapshot_id'],
+                'owner': {'id': playlist['owner']},
+                'tracks': {'total': len(playlist['items'])}}
+
+    def track_by_uri(self, uri):
+        if not hasattr(self, '_by_uri'):
+            self._by_uri = {t['uri']: t for t in self.catalog}
+        return self._by_uri[uri]
+
+
+def paging(url, items, offset, limit):
+    next_url = None
+    if offset + limit < len(items):
+        next_url = f'{url}?offset={offset + limit}&limit={limit}'
+    return {'href': url, 'items': items[offset:offset + limit],
+            'limit': limit, 'offset': offset, 'total': len(items),
+            'next': next_url}
+
+
+def render_league(data):
+    rounds = ''.join(f'''
+    <div class="round-bar complete">
+      <div class="round-title">{html.escape(rnd['title'])}</div>
+      <a href="https://open.spotify.com/playlist/{rnd['id']}"><span class="playlist">Playlist</span></a>
+      <a href="/l/{LEAGUE_ID}/{rnd['id']}/results/"><span class="results">Results</span></a>
+    </div>''' for rnd in data.rounds)  # noqa: E501
+    return f'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head><body>
+  <div class="league-title">肥宅聽歌團</div>
+  <div class="rounds">{rounds}
+  </div>
+</body></html>'''
+
+
+def render_round(rnd):
+    songs = []
+    for song in rnd['songs']:
+        track = song['track']
+        comments = ''.join(
+            f'<div class="comment">{html.escape(text)}'
+            f'<span class="commenter">- {voter}</span></div>'
+            for voter, text in song['comments'])
+        upvotes = ''.join(
+            f'<div class="upvote"><span class="vote-count">{score}</span> '
+            f'<span class="voter">{voter}</span></div>'
+            for voter, score in song['upvotes'])
+        songs.append(f'''
+    <div class="song">
+      <img src="https://i.scdn.co/image/{track['id']}">
+      <div class="song-info">
+        <a class="name" href="https://open.spotify.com/track/{track['id']}">{html.escape(track['name'])}</a>
+        <span class="artist">by {html.escape(track['artists'][0]['name'])}</span>
+        <span class="submitter">Submitted by <b>{song['submitter']}</b></span>
+      </div>
+      <div class="comments">{comments}</div>
+      <div class="upvotes">{upvotes}</div>
+    </div>''')  # noqa: E501
+    return f'''<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head><body>
+  <div class="round-title">{html.escape(rnd['title'])}</div>
+  <div class="songs">{''.join(songs)}
+  </div>
+</body></html>'''
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data, latency=0.0, rate_limit_ratio=0.0,
+                 retry_after=1):
+        super().__init__(address, StandinHandler)
+        self.data = data
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.counts = {}
+        self.bytes_sent = 0
+        self.counts_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def count(self, endpoint, size):
+        with self.counts_lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            self.bytes_sent += size
+
+    def reset_counts(self):
+        with self.counts_lock:
+            self.counts = {}
+            self.bytes_sent = 0
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, endpoint, status, body, content_type='application/json',
+              headers=None):
+        if not isinstance(body, bytes):
+            if content_type == 'application/json':
+                body = json.dumps(body)
+            body = body.encode('utf-8')
+        self.server.count(endpoint, len(body))
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        try:
+            return json.loads(body or b'{}')
+        except ValueError:
+            return {}
+
+    def _handle(self, method):
+        server = self.server
+        data = server.data
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = self._json_body() if method in ('POST', 'PUT') else {}
+        if server.latency:
+            time.sleep(server.latency)
+
+        if (url.path.startswith('/v1/')
+                and random.random() < server.rate_limit_ratio):
+            return self._send('429', 429, {'error': {'status': 429}},
+                              headers={'Retry-After': server.retry_after})
+
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', 20))
+        base = server.base_url + url.path
+
+        if url.path == '/api/token' and method == 'POST':
+            return self._send('token', 200, {
+                'access_token': uuid4().hex, 'token_type': 'Bearer',
+                'scope': 'playlist-modify-public playlist-read-private',
+                'expires_in': 3600})
+
+        if url.path == '/v1/me':
+            return self._send('me', 200, {'id': data.owner})
+
+        if url.path == '/v1/me/playlists':
+            summaries = [data.summary(p) for p in data.playlists.values()]
+            return self._send(
+                'playlists', 200, paging(base, summaries, offset, limit))
+
+        match = re.match(r'^/v1/playlists/(\w+)(/tracks)?$', url.path)
+        if match:
+            playlist = data.playlists.get(match.group(1))
+            if playlist is None:
+                return self._send('404', 404, {'error': {'status': 404}})
+            if not match.group(2):
+                return self._send('playlist', 200, data.summary(playlist))
+            if method == 'GET':
+                return self._send('tracks', 200, paging(
+                    base, playlist['items'], offset, min(limit, 100)))
+            with data.lock:
+                self._modify(playlist, method, body)
+                snapshot_id = playlist['snapshot_id']
+            return self._send(
+                f'tracks:{method}', 201 if method == 'POST' else 200,
+                {'snapshot_id': snapshot_id})
+
+        if url.path == f'/l/{LEAGUE_ID}/':
+            return self._send('league', 200, render_league(data),
+                              content_type='text/html; charset=utf-8')
+        match = re.match(rf'^/l/{LEAGUE_ID}/(\w+)/results/$', url.path)
+        if match:
+            rnd = next((r for r in data.rounds if r['id'] == match.group(1)),
+                       None)
+            if rnd is not None:
+                return self._send('round', 200, render_round(rnd),
+                                  content_type='text/html; charset=utf-8')
+        return self._send('404', 404, {'error': {'status': 404}})
+
+    def _modify(self, playlist, method, body):
+        data = self.server.data
+        items = playlist['items']
+        if method == 'POST':
+            items.extend({'added_by': {'id': data.owner},
+                          'track': data.track_by_uri(uri)}
+                         for uri in body.get('uris', []))
+        elif 'uris' in body:
+            playlist['items'] = [{'added_by': {'id': data.owner},
+                                  'track': data.track_by_uri(uri)}
+                                 for uri in body['uris']]
+        else:
+            start = body['range_start']
+            length = body.get('range_length', 1)
+            insert_before = body['insert_before']
+            block = items[start:start + length]
+            del items[start:start + length]
+            if insert_before > start:
+                insert_before -= length
+            items[insert_before:insert_before] = block
+        playlist['snapshot_id'] = uuid4().hex
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+
+def start_server(data, host='127.0.0.1', port=0, **options):
+    """ Starts the server on a background thread and returns it.
+    """
+    server = StandinServer((host, port), data, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--pool-size', type=int, default=10000)
+    arg_parser.add_argument('--latency', type=float, default=0.0)
+    arg_parser.add_argument('--rate-limit-ratio', type=float, default=0.0)
+    args = arg_parser.parse_args()
+
+    server = StandinServer(
+        ('127.0.0.1', args.port), StandinData(pool_size=args.pool_size),
+        latency=args.latency, rate_limit_ratio=args.rate_limit_ratio)
+    print(f"Serving on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,140 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
 import click
 
-from fn_helper import config, SpotifyClient
-from fn_helper.util import id_from_uri
+from fn_helper import PoolIndex, SpotifyClient
+from fn_helper.playlist_directory import PlaylistDirectory
+from fn_helper.pool_index import entry_from_item
+from fn_helper.util import is_uri
+
+GLOB_CHARS = set('*?[')
+
+
+def _resolve_playlists(spotify_client, queries):
+    """ Resolves uris, name substrs and name globs to `(query, playlist_id)`
+        without duplicates.
+    """
+    resolved = {}
+    for query in queries:
+        if not is_uri(query) and GLOB_CHARS & set(query):
+            matched = PlaylistDirectory.shared(spotify_client).glob(query)
+            if not matched:
+                raise ValueError(f"No playlist matches {query!r}.")
+            for playlist in matched:
+                resolved.setdefault(playlist['id'], query)
+        else:
+            resolved.setdefault(spotify_client.get_playlist_id(query), query)
+    return [(query, playlist_id) for playlist_id, query in resolved.items()]
+
+
+def _cross_duplicates(submissions):
+    """ Finds tracks submitted in more than one playlist, matched by ID, ISRC
+        or normalized artist and title.
+    """
+    seen = {}
+    dups = []
+    for submission in submissions:
+        for entry in submission['entries']:
+            for column in ('track_id', 'isrc', 'title_key'):
+                other = seen.get((column, entry[column]))
+                # Playlists are told apart by ID, names need not be unique.
+                if (entry[column] and other
+                        and other[0] != submission['id']):
+                    dups.append({
+                        'track': entry['name'],
+                        'playlist': submission['name'],
+                        'playlist_id': submission['id'],
+                        'other_track': other[2],
+                        'other_playlist': other[1],
+                        'other_playlist_id': other[0],
+                        'reason': column,
+                    })
+                    break
+            for column in ('track_id', 'isrc', 'title_key'):
+                if entry[column]:
+                    seen.setdefault(
+                        (column, entry[column]),
+                        (submission['id'], submission['name'], entry['name']))
+    return dups
 
 
-def _check_dup(playlist):
-    """ Checks whether the playlist (matched by uri or name substr)
-        has any tracks already in the pool.
+def _check_dup(*playlists, output_format='text'):
+    """ Checks whether the playlists (matched by uri, name substr or name
+        glob) have any tracks already in the pool, or in each other. Tracks
+        match by ID, ISRC or normalized artist and title so re-releases are
+        caught as well. Returns the report dict.
     """
 
     spotify_client = SpotifyClient()
-    playlist_id = spotify_client.get_playlist_id(playlist)
+    pool_index = PoolIndex()
+    pool_index.sync(spotify_client)
 
-    tracks = spotify_client.all_tracks_in_playlist(playlist_id)
-    tracks = {t['track']['id']: t['track']['name'] for t in tracks if t}
+    def fetch(resolved):
+        """ Checks the tracks against the pool as their pages arrive.
+        """
+        query, playlist_id = resolved
+        metadata = spotify_client.get_playlist(playlist_id)
+        entries = []
+        pool_duplicates = []
+        for item in spotify_client.iter_tracks_in_playlist(
+                playlist_id, metadata=metadata):
+            if not item or not item.get('track'):
+                continue
+            entry = entry_from_item(item)
+            entries.append(entry)
+            match = pool_index.lookup(entry)
+            if match:
+                reason, pool_track = match
+                pool_duplicates.append({'track': entry['name'],
+                                        'reason': reason,
+                                        'pool_track': pool_track})
+        return {
+            'query': query,
+            'id': playlist_id,
+            'name': metadata['name'],
+            'entries': entries,
+            'pool_duplicates': pool_duplicates,
+        }
 
-    pool_playlist_id = id_from_uri(config['ALL_POOL'])
-    pool_tracks = spotify_client.all_tracks_in_playlist(pool_playlist_id)
-    pool_track_ids = set(t['track']['id'] for t in pool_tracks if t)
+    resolved = _resolve_playlists(spotify_client, playlists)
+    with ThreadPoolExecutor(max_workers=spotify_client.max_workers) as pool:
+        submissions = list(pool.map(fetch, resolved))
 
-    dups = set(tracks.keys()).intersection(pool_track_ids)
-    dups = [tracks[t_id] for t_id in dups]
-    if dups:
-        print("Duplicated tracks found: %s" % dups)
-    else:
-        print("No duplicated tracks detected.")
-    return dups
+    report = {
+        'pool_snapshot_id': pool_index.snapshot_id,
+        'playlists': [
+            {'query': s['query'], 'id': s['id'], 'name': s['name'],
+             'tracks': len(s['entries']),
+             'pool_duplicates': s['pool_duplicates']}
+            for s in submissions],
+        'cross_duplicates': _cross_duplicates(submissions),
+    }
+
+    if output_format == 'json':
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return report
+
+    for submission in report['playlists']:
+        dups = [d['track'] for d in submission['pool_duplicates']]
+        if dups:
+            print("Duplicated tracks found in %s: %s" % (
+                submission['name'], dups))
+        else:
+            print("No duplicated tracks detected in %s." % submission['name'])
+    for dup in report['cross_duplicates']:
+        print("%s in %s is also submitted in %s as %s." % (
+            dup['track'], dup['playlist'], dup['other_playlist'],
+            dup['other_track']))
+    return report
 
 
 @click.command()
-@click.argument('playlist', nargs=1)
-def check_dup(playlist):
-    _check_dup(playlist)
+@click.argument('playlists', nargs=-1, required=True)
+@click.option('--json', 'output_format', flag_value='json',
+              help="Print a machine-readable JSON report.")
+def check_dup(playlists, output_format):
+    _check_dup(*playlists, output_format=output_format or 'text')
 
 
 if __name__ == '__main__':
@@ -1,4 +1,29 @@
+import importlib
+
 from .config import config
-from .musicleague_util import (
-    MLRoundIterator, MusicLeagueClient, MUSIC_LEAGUE_DOMAIN)
-from .spotify_util import SpotifyClient, SpotifyNerdPlaylistIterator
+
+# Exports imported on first access, so importing the package does not pull
+# in requests, browser_cookie3 or the parsers for commands not using them.
+_LAZY_EXPORTS = {
+    'MLRoundIterator': '.musicleague_util',
+    'MusicLeagueClient': '.musicleague_util',
+    'MUSIC_LEAGUE_DOMAIN': '.musicleague_util',
+    'SpotifyClient': '.spotify_util',
+    'SpotifyNerdPlaylistIterator': '.spotify_util',
+    'PoolIndex': '.pool_index',
+}
+
+__all__ = ['config'] + list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,75 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from .config import config
+
+DEFAULT_CACHE_PATH = 'spotify_cache.db'
+
+
+class PlaylistCache:
+    """ On-disk SQLite cache for playlist metadata and track listings keyed by
+        Spotify's playlist `snapshot_id`. Least recently used playlists are
+        evicted once `max_entries` or `max_bytes` is exceeded.
+    """
+
+    def __init__(self, path=None, max_entries=None, max_bytes=None):
+        self.path = path or config.get('CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries or config.get(
+            'CACHE_MAX_PLAYLISTS', 200)
+        self.max_bytes = max_bytes or config.get(
+            'CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS playlists (
+                    id TEXT PRIMARY KEY,
+                    snapshot_id TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    tracks BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+
+    def get_tracks(self, playlist_id, snapshot_id):
+        """ Returns the cached track listing, or None when the playlist is not
+            cached or changed since it was cached.
+        """
+        with self.lock, self.db:
+            row = self.db.execute(
+                "SELECT tracks FROM playlists "
+                "WHERE id = ? AND snapshot_id = ?",
+                (playlist_id, snapshot_id)).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE playlists SET accessed_at = ? WHERE id = ?",
+                (time.time(), playlist_id))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, playlist_id, snapshot_id, tracks, metadata=None):
+        blob = zlib.compress(json.dumps(tracks).encode('utf-8'))
+        with self.lock, self.db:
+            self.db.execute(
+                "REPLACE INTO playlists VALUES (?, ?, ?, ?, ?, ?)",
+                (playlist_id, snapshot_id, json.dumps(metadata or {}), blob,
+                 len(blob), time.time()))
+            self._evict()
+
+    def _evict(self):
+        """ Drops least recently used playlists until both limits are met.
+            Must be called holding the lock inside a transaction.
+        """
+        rows = self.db.execute(
+            "SELECT id, size FROM playlists ORDER BY accessed_at DESC"
+        ).fetchall()
+        total_bytes = 0
+        evicted = []
+        for n, (playlist_id, size) in enumerate(rows):
+            total_bytes += size
+            if n >= self.max_entries or total_bytes > self.max_bytes:
+                evicted.append((playlist_id,))
+        self.db.executemany("DELETE FROM playlists WHERE id = ?", evicted)
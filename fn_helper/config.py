@@ -1,4 +1,40 @@
-import yaml
+import threading
 
-with open("config.yml", "r") as f:
-    config = yaml.load(f, Loader=yaml.FullLoader)
+CONFIG_PATH = "config.yml"
+
+
+class LazyConfig:
+    """ `config.yml`, parsed on first access rather than at import so commands
+        and `--help` start without reading it.
+    """
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self._data = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._data is None:
+                import yaml
+                with open(self.path, "r") as f:
+                    self._data = yaml.load(f, Loader=yaml.FullLoader)
+            return self._data
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def get(self, key, default=None):
+        return self.load().get(key, default)
+
+
+config = LazyConfig()
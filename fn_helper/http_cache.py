@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from .cache import DEFAULT_CACHE_PATH
+from .config import config
+from .profiling import profiler
+
+
+class ResponseCache:
+    """ On-disk cache of page bodies with their ETag/Last-Modified validators,
+        and of compact serialized parse results.
+    """
+
+    def __init__(self, path=None):
+        path = path or config.get('CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS http_responses (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    permanent INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS parsed_pages (
+                    url TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                );""")
+
+    def get(self, url):
+        """ Returns a dict of the cached response, or None.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT body, etag, last_modified, fetched_at, permanent "
+                "FROM http_responses WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at, permanent = row
+        return {'body': zlib.decompress(body).decode('utf-8'), 'etag': etag,
+                'last_modified': last_modified, 'fetched_at': fetched_at,
+                'permanent': bool(permanent)}
+
+    def put(self, url, body, etag=None, last_modified=None, permanent=False):
+        with self.lock, self.db:
+            self.db.execute(
+                "REPLACE INTO http_responses VALUES (?, ?, ?, ?, ?, ?)",
+                (url, zlib.compress(body.encode('utf-8')), etag,
+                 last_modified, time.time(), int(permanent)))
+
+    def touch(self, url):
+        """ Marks a cached response as fresh after a 304 revalidation.
+        """
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE http_responses SET fetched_at = ? WHERE url = ?",
+                (time.time(), url))
+
+    def get_parsed(self, url):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data FROM parsed_pages WHERE url = ?",
+                (url,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def put_parsed(self, url, data):
+        blob = zlib.compress(
+            json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        with self.lock, self.db:
+            self.db.execute(
+                "REPLACE INTO parsed_pages VALUES (?, ?)", (url, blob))
+
+
+def cached_get(session, cache, url, ttl=0, permanent=False):
+    """ GETs the page body through the cache. Permanent pages are never
+        refetched, others are served for `ttl` seconds and then revalidated
+        with ETag/Last-Modified when the server provided them.
+    """
+    cached = cache.get(url)
+    headers = {}
+    if cached:
+        if cached['permanent'] or time.time() - cached['fetched_at'] < ttl:
+            profiler.count('cache.http.hit')
+            return cached['body']
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    started = time.perf_counter()
+    resp = session.get(url, headers=headers)
+    profiler.record_request(
+        'GET', url, resp.status_code, started, len(resp.content))
+    if resp.status_code == 304 and cached:
+        cache.touch(url)
+        return cached['body']
+    if not resp.ok:
+        raise ValueError(resp.text)
+    cache.put(url, resp.text, etag=resp.headers.get('ETag'),
+              last_modified=resp.headers.get('Last-Modified'),
+              permanent=permanent)
+    return resp.text
@@ -0,0 +1,168 @@
+import sqlite3
+import threading
+
+from .config import config
+
+DEFAULT_HISTORY_PATH = 'league_history.db'
+
+
+class LeagueHistory:
+    """ Local SQLite warehouse of completed rounds, their submissions, upvotes
+        and comments, so questions across rounds are answered with a query
+        instead of scraping again. Results of completed rounds never change,
+        so every round is ingested once.
+    """
+
+    def __init__(self, path=None):
+        path = path or config.get('HISTORY_PATH', DEFAULT_HISTORY_PATH)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS rounds (
+                    url TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    playlist_link TEXT
+                );
+                CREATE TABLE IF NOT EXISTS submissions (
+                    round_url TEXT NOT NULL,
+                    track_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    artist TEXT,
+                    submitter TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    PRIMARY KEY (round_url, track_id)
+                );
+                CREATE TABLE IF NOT EXISTS votes (
+                    round_url TEXT NOT NULL,
+                    track_id TEXT NOT NULL,
+                    voter TEXT NOT NULL,
+                    submitter TEXT NOT NULL,
+                    points INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS comments (
+                    round_url TEXT NOT NULL,
+                    track_id TEXT NOT NULL,
+                    commenter TEXT NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS votes_by_pair
+                    ON votes (voter, submitter);""")
+
+    def ingested_rounds(self):
+        with self.lock:
+            return {url for url, in self.db.execute(
+                "SELECT url FROM rounds")}
+
+    def add_round(self, seq, ml_round):
+        """ Stores a completed round and its results in one transaction.
+        """
+        result = ml_round.result
+        submissions, votes, comments = [], [], []
+        for track in result.tracks:
+            submissions.append((
+                ml_round.round_url, track.spotify_id, track.name,
+                track.artist, track.submitted_by, track.score))
+            votes.extend(
+                (ml_round.round_url, track.spotify_id, voter,
+                 track.submitted_by, points)
+                for voter, points in track.upvotes.items())
+            comments.extend(
+                (ml_round.round_url, track.spotify_id, commenter, text)
+                for commenter, text in track.comments.items())
+        with self.lock, self.db:
+            self.db.execute(
+                "DELETE FROM submissions WHERE round_url = ?",
+                (ml_round.round_url,))
+            self.db.execute(
+                "DELETE FROM votes WHERE round_url = ?",
+                (ml_round.round_url,))
+            self.db.execute(
+                "DELETE FROM comments WHERE round_url = ?",
+                (ml_round.round_url,))
+            self.db.execute(
+                "REPLACE INTO rounds VALUES (?, ?, ?, ?)",
+                (ml_round.round_url, seq, ml_round.title,
+                 ml_round.playlist_link))
+            self.db.executemany(
+                "INSERT INTO submissions VALUES (?, ?, ?, ?, ?, ?)",
+                submissions)
+            self.db.executemany(
+                "INSERT INTO votes VALUES (?, ?, ?, ?, ?)", votes)
+            self.db.executemany(
+                "INSERT INTO comments VALUES (?, ?, ?, ?)", comments)
+
+    def ingest(self, rounds):
+        """ Adds the rounds not ingested yet, returning how many were added.
+        """
+        ingested = self.ingested_rounds()
+        added = 0
+        for seq, ml_round in enumerate(rounds):
+            if ml_round.round_url in ingested:
+                continue
+            self.add_round(seq, ml_round)
+            added += 1
+        return added
+
+    def _query(self, sql, rounds=None, params=()):
+        """ Runs the query over the rounds whose title matches the `rounds`
+            glob, or all rounds. The query selects from `scope`, the matched
+            round URLs.
+        """
+        scope = "SELECT url FROM rounds"
+        if rounds:
+            scope += " WHERE title GLOB ?"
+            params = (rounds,) + tuple(params)
+        with self.lock:
+            return self.db.execute(
+                f"WITH scope AS ({scope}) {sql}", params).fetchall()
+
+    def leaderboard(self, rounds=None):
+        """ `(submitter, total score, rounds won, rounds played)` sorted by
+            total score.
+        """
+        return self._query("""
+            , totals AS (
+                SELECT round_url, submitter, SUM(score) AS score
+                FROM submissions WHERE round_url IN scope
+                GROUP BY round_url, submitter),
+            winners AS (
+                SELECT round_url, MAX(score) AS score
+                FROM totals GROUP BY round_url)
+            SELECT t.submitter, SUM(t.score),
+                   SUM(t.score = w.score), COUNT(*)
+            FROM totals t JOIN winners w USING (round_url)
+            GROUP BY t.submitter
+            ORDER BY SUM(t.score) DESC, t.submitter""", rounds)
+
+    def average_scores(self, rounds=None):
+        """ `(submitter, average score per submission, submissions)` sorted
+            by average score.
+        """
+        return self._query("""
+            SELECT submitter, AVG(score), COUNT(*)
+            FROM submissions WHERE round_url IN scope
+            GROUP BY submitter
+            ORDER BY AVG(score) DESC, submitter""", rounds)
+
+    def affinity(self, rounds=None, normalize=False):
+        """ Voter to submitter matrix of the points given, as
+            `(voters, submitters, rows)`. Normalized rows hold the share of
+            each voter's points.
+        """
+        pairs = self._query("""
+            SELECT voter, submitter, SUM(points)
+            FROM votes WHERE round_url IN scope
+            GROUP BY voter, submitter""", rounds)
+        voters = sorted({voter for voter, _, _ in pairs})
+        submitters = sorted({submitter for _, submitter, _ in pairs})
+        column = {submitter: i for i, submitter in enumerate(submitters)}
+        row_of = {voter: i for i, voter in enumerate(voters)}
+        matrix = [[0] * len(submitters) for _ in voters]
+        for voter, submitter, points in pairs:
+            matrix[row_of[voter]][column[submitter]] = points
+        if normalize:
+            matrix = [[points / (sum(row) or 1) for points in row]
+                      for row in matrix]
+        return voters, submitters, matrix
@@ -0,0 +1,192 @@
+from .config import config
+from .util import remove_prefix
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+class SoupParserBackend:
+    """ Pure python BeautifulSoup backend with `html.parser`. Backends return
+        plain data, `MusicLeagueClient` builds the ML objects out of it.
+    """
+    name = 'html.parser'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self.BeautifulSoup = BeautifulSoup
+
+    @staticmethod
+    def _extract_classes_string(parent, *names):
+        return [_str(parent.find(class_=n).string) for n in names]
+
+    def parse_league(self, text):
+        league_dom = self.BeautifulSoup(text, 'html.parser')
+        title = _str(league_dom.find(class_="league-title").string)
+
+        rounds = []
+        for rnd in league_dom.find_all(class_="round-bar complete"):
+            rounds.append((
+                _str(rnd.find(class_="round-title").string),
+                rnd.find(class_="playlist").parent['href'],
+                rnd.find(class_="results").parent['href']))
+        return title, rounds
+
+    def parse_round(self, text):
+        bs = self.BeautifulSoup(text, 'html.parser')
+
+        title = _str(bs.find(class_="round-title").string)
+
+        tracks = []
+        for track_dom in bs.find_all(class_="song"):
+            song_info = track_dom.find(class_="song-info")
+            name, artist = self._extract_classes_string(
+                song_info, "name", "artist")
+
+            comments = {}
+            for comment_dom in track_dom.find_all(class_="comment"):
+                commenter = remove_prefix(
+                    str(comment_dom.find(class_="commenter").string), "- ")
+                comments[commenter] = _str(comment_dom.next_element)
+
+            upvotes = {}
+            for upvote in track_dom.find_all(class_="upvote"):
+                score, voter = self._extract_classes_string(
+                    upvote, "vote-count", "voter")
+                upvotes[voter] = int(score)
+
+            tracks.append({
+                'name': name,
+                'img_url': track_dom.img['src'],
+                'link': song_info.find(class_="name")['href'],
+                'artist': remove_prefix(artist, "by "),
+                'submitted_by': _str(song_info.find(
+                    class_="submitter").contents[1].string),
+                'comments': comments,
+                'upvotes': upvotes,
+            })
+        return title, tracks
+
+
+class LxmlParserBackend:
+    """ libxml2 based backend with precompiled XPath selectors.
+    """
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import etree, html
+        self.etree = etree
+        self.html = html
+
+        def by_class(name):
+            return etree.XPath(
+                ".//*[contains(concat(' ', normalize-space(@class), ' '), "
+                f"' {name} ')]")
+
+        self.find = {name: by_class(name) for name in (
+            'league-title', 'round-title', 'playlist', 'results', 'song',
+            'song-info', 'name', 'artist', 'submitter', 'comment',
+            'commenter', 'upvote', 'vote-count', 'voter')}
+        self.complete_rounds = etree.XPath(
+            ".//*[normalize-space(@class)='round-bar complete']")
+        self.img = etree.XPath(".//img")
+
+    @classmethod
+    def _string(cls, element):
+        """ Equivalent of BeautifulSoup's `Tag.string`.
+        """
+        if not len(element):
+            return element.text
+        if len(element) == 1 and not element.text and not element[0].tail:
+            return cls._string(element[0])
+        return None
+
+    @staticmethod
+    def _contents(element):
+        """ Equivalent of BeautifulSoup's `Tag.contents`.
+        """
+        contents = [element.text] if element.text else []
+        for child in element:
+            contents.append(child)
+            if child.tail:
+                contents.append(child.tail)
+        return contents
+
+    def _first(self, name, parent):
+        return self.find[name](parent)[0]
+
+    def _first_string(self, name, parent):
+        return self._string(self._first(name, parent))
+
+    def parse_league(self, text):
+        league_dom = self.html.fromstring(text)
+        title = self._first_string('league-title', league_dom)
+
+        rounds = []
+        for rnd in self.complete_rounds(league_dom):
+            rounds.append((
+                self._first_string('round-title', rnd),
+                self._first('playlist', rnd).getparent().get('href'),
+                self._first('results', rnd).getparent().get('href')))
+        return title, rounds
+
+    def parse_round(self, text):
+        dom = self.html.fromstring(text)
+
+        title = self._first_string('round-title', dom)
+
+        tracks = []
+        for track_dom in self.find['song'](dom):
+            song_info = self._first('song-info', track_dom)
+            name_dom = self._first('name', song_info)
+            artist = self._first_string('artist', song_info)
+
+            comments = {}
+            for comment_dom in self.find['comment'](track_dom):
+                commenter = remove_prefix(
+                    str(self._first_string('commenter', comment_dom)), "- ")
+                comment = (comment_dom.text if comment_dom.text is not None
+                           else self.etree.tostring(
+                               comment_dom[0], encoding='unicode',
+                               with_tail=False))
+                comments[commenter] = comment
+
+            upvotes = {}
+            for upvote in self.find['upvote'](track_dom):
+                voter = self._first_string('voter', upvote)
+                upvotes[voter] = int(self._first_string('vote-count', upvote))
+
+            submitter = self._contents(
+                self._first('submitter', song_info))[1]
+            if not isinstance(submitter, str):
+                submitter = self._string(submitter)
+
+            tracks.append({
+                'name': self._string(name_dom),
+                'img_url': self.img(track_dom)[0].get('src'),
+                'link': name_dom.get('href'),
+                'artist': remove_prefix(artist, "by "),
+                'submitted_by': submitter,
+                'comments': comments,
+                'upvotes': upvotes,
+            })
+        return title, tracks
+
+
+PARSER_BACKENDS = {
+    LxmlParserBackend.name: LxmlParserBackend,
+    SoupParserBackend.name: SoupParserBackend,
+}
+
+
+def get_parser_backend(name=None):
+    """ Returns the backend named by `name` or the `ML_PARSER` config. By
+        default lxml is used when installed, html.parser otherwise.
+    """
+    name = name or config.get('ML_PARSER')
+    if name:
+        return PARSER_BACKENDS[name]()
+    try:
+        return LxmlParserBackend()
+    except ImportError:
+        return SoupParserBackend()
@@ -0,0 +1,171 @@
+import json
+import os
+import os.path
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from .config import config
+
+KEYRING_SERVICE = 'music_helper'
+KEYRING_USERNAME = 'music_league_cookies'
+# Session cookies carry no expiry, re-read them from the browser after a week.
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+
+class LoginRequired(Exception):
+    pass
+
+
+def is_login_page(resp):
+    """ Music League answers requests without a valid session with 401/403
+        or by redirecting to its login page.
+    """
+    return (resp.status_code in (401, 403)
+            or 'login' in urlparse(resp.url).path.lower())
+
+
+class MLSessionStore:
+    """ Music League cookies, extracted from the browser cookie database once
+        and saved locally until they expire, encrypted with AES-GCM under a
+        key kept in the system keyring. One `requests.Session` is shared per
+        process. The browser database is only read again when the saved
+        cookies expired or Music League answers with its login page.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, domain):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(domain)
+            return cls._shared
+
+    def __init__(self, domain, path=None):
+        self.domain = domain
+        self.path = path or config.get('ML_COOKIE_PATH', 'ml_cookies.bin')
+        self.max_age = config.get('ML_COOKIE_MAX_AGE', DEFAULT_MAX_AGE)
+        self.lock = threading.Lock()
+        # Bumped on every browser re-read, so concurrent login failures
+        # trigger a single one.
+        self.generation = 0
+        self.session = requests.Session()
+        self.session.hooks['response'].append(self._check_login)
+
+        cookies = self._load()
+        if cookies is None:
+            cookies = self._from_browser()
+            self._save(cookies)
+        self._use(cookies)
+
+    def _check_login(self, resp, *args, **kwargs):
+        if is_login_page(resp):
+            raise LoginRequired(resp.url)
+
+    def _key(self):
+        import keyring
+
+        key = keyring.get_password(KEYRING_SERVICE, KEYRING_USERNAME)
+        if key is None:
+            key = os.urandom(32).hex()
+            keyring.set_password(KEYRING_SERVICE, KEYRING_USERNAME, key)
+        return bytes.fromhex(key)
+
+    def _from_browser(self):
+        """ Reads the cookies of the domain from the browser cookie database,
+            which may prompt for keychain access.
+        """
+        import browser_cookie3
+
+        browser_name = config['BROWSER_NAME'].lower()
+        cookie_reader = getattr(browser_cookie3, browser_name)
+        return [{'name': c.name, 'value': c.value, 'domain': c.domain,
+                 'path': c.path, 'expires': c.expires, 'secure': c.secure}
+                for c in cookie_reader(domain_name=self.domain)]
+
+    def _use(self, cookies):
+        jar = requests.cookies.RequestsCookieJar()
+        for cookie in cookies:
+            jar.set_cookie(requests.cookies.create_cookie(**cookie))
+        self.session.cookies = jar
+
+    def _load(self):
+        """ Returns the saved cookies, or None when there are none, they
+            expired or cannot be decrypted.
+        """
+        if not os.path.exists(self.path):
+            return None
+        from Crypto.Cipher import AES
+        from keyring.errors import KeyringError
+
+        with open(self.path, 'rb') as f:
+            blob = f.read()
+        nonce, tag, ciphertext = blob[:12], blob[12:28], blob[28:]
+        try:
+            cipher = AES.new(self._key(), AES.MODE_GCM, nonce=nonce)
+            saved = json.loads(cipher.decrypt_and_verify(ciphertext, tag))
+        except (KeyringError, ValueError):
+            return None
+        if saved['expires_at'] <= time.time():
+            return None
+        return saved['cookies']
+
+    def _save(self, cookies):
+        """ Writes the cookies atomically, encrypted and readable by the owner
+            only. Without cookies or a usable keyring nothing is saved and the
+            browser is read again by the next process.
+        """
+        if not cookies:
+            return
+        from Crypto.Cipher import AES
+        from keyring.errors import KeyringError
+
+        expiries = [c['expires'] for c in cookies if c['expires']]
+        expires_at = min(expiries + [time.time() + self.max_age])
+        data = json.dumps({'expires_at': expires_at, 'cookies': cookies})
+        try:
+            key = self._key()
+        except KeyringError as e:
+            print(f"Music League cookies are not saved: {e}")
+            return
+        nonce = os.urandom(12)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        ciphertext, tag = cipher.encrypt_and_digest(data.encode('utf-8'))
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(nonce + tag + ciphertext)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def refresh(self, stale_generation):
+        """ Re-reads the cookies from the browser unless another thread
+            already did since `stale_generation`.
+        """
+        with self.lock:
+            if self.generation != stale_generation:
+                return
+            cookies = self._from_browser()
+            self._save(cookies)
+            self._use(cookies)
+            self.generation += 1
+
+    def get(self, fetch):
+        """ Calls `fetch(session)`, re-reading the browser cookies and
+            retrying once when Music League asks to log in.
+        """
+        generation = self.generation
+        try:
+            return fetch(self.session)
+        except LoginRequired:
+            self.refresh(generation)
+            return fetch(self.session)
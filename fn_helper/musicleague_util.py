@@ -1,16 +1,20 @@
 import os.path
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from functools import partial
 from typing import Any
 from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
-import browser_cookie3
-import requests
-
-from .util import ElementIterator, remove_prefix
+from .http_cache import ResponseCache, cached_get
+from .ml_parsers import get_parser_backend
+from .ml_session import MLSessionStore
+from .profiling import profiler
+from .util import ElementIterator
 from .config import config
 
 MUSIC_LEAGUE_DOMAIN = 'musicleague.app'
+MUSIC_LEAGUE_URL = f'https://{MUSIC_LEAGUE_DOMAIN}'
 
 
 @dataclass
@@ -40,13 +44,24 @@ class MLTrack:
 class MLRoundResult:
     title: str
     tracks: list
+    _vote_count: Any = field(default=None, repr=False, compare=False)
 
     @property
     def vote_count(self):
-        result = {}
-        for t in self.tracks:
-            result[t.submitted_by] = result.get(t.submitted_by, 0) + t.score
-        return sorted(result.items(), key=lambda x: x[1], reverse=True)
+        """ `(submitter, score)` sorted by score, computed once per round.
+        """
+        if self._vote_count is None:
+            result = {}
+            for t in self.tracks:
+                result[t.submitted_by] = (
+                    result.get(t.submitted_by, 0) + t.score)
+            self._vote_count = sorted(
+                result.items(), key=lambda x: x[1], reverse=True)
+        return self._vote_count
+
+    @property
+    def total_score(self):
+        return sum(score for _, score in self.vote_count)
 
 
 @dataclass
@@ -54,19 +69,45 @@ class MLRound:
     title: str
     playlist_link: str
     _result: Any
+    round_url: str = None
+    _lock: Any = field(
+        default_factory=threading.Lock, repr=False, compare=False)
 
     @property
     def result(self):
         """ Lazy result for speed improvement
         """
-        if not isinstance(self._result, MLRoundResult):
-            self._result = self._result['parser'](self._result['round_url'])
-        return self._result
+        with self._lock:
+            if isinstance(self._result, MLRoundResult):
+                return self._result
+            future = self._result.get('future')
+        if future is not None:
+            result = future.result()
+        else:
+            result = self._result['parser'](self._result['round_url'])
+        with self._lock:
+            self._result = result
+        return result
+
+    def prefetch(self, executor):
+        """ Starts fetching the result on the executor unless it is already
+            fetched or being fetched.
+        """
+        with self._lock:
+            if (isinstance(self._result, MLRoundResult)
+                    or 'future' in self._result):
+                return
+            self._result['future'] = executor.submit(
+                self._result['parser'], self._result['round_url'])
 
     @property
     def tracks(self):
         return self.result.tracks
 
+    @property
+    def checkpoint_id(self):
+        return self.round_url
+
     def __str__(self):
         return self.title
 
@@ -78,93 +119,102 @@ class MLLeague:
 
 
 class MLRoundIterator(ElementIterator):
-    def __init__(self):
-        league_client = MusicLeagueClient()
+    """ Iterates through completed rounds. The results of the next `prefetch`
+        rounds are fetched in the background, at most `max_workers` at once.
+    """
+
+    def __init__(self, prefetch=None, max_workers=None):
+        league_client = MusicLeagueClient.shared()
         self.elements = league_client.parse_league().completed_rounds
+        self.prefetch = (config.get('ML_PREFETCH_ROUNDS', 4)
+                         if prefetch is None else prefetch)
+        self.executor = None
+        if self.prefetch:
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers or config.get('ML_MAX_WORKERS', 2))
 
+    def __next__(self):
+        element = super().__next__()
+        if self.executor:
+            for upcoming in self.elements[self.n:self.n + self.prefetch]:
+                upcoming.prefetch(self.executor)
+        return element
 
-class MusicLeagueClient:
 
-    @staticmethod
-    def _extract_classes_string(parent, *names):
-        return [parent.find(class_=n).string for n in names]
+class MusicLeagueClient:
+    _shared = None
+    _shared_lock = threading.Lock()
 
-    def parse_league(self, url=None):
+    @classmethod
+    def shared(cls):
+        """ The process-wide client, so the session and its cookies are
+            reused across iterators.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def parse_league(self, url=None, ttl=None):
+        """ Parses the league page, served from the local cache for `ttl`
+            seconds (`ML_LEAGUE_TTL`) and revalidated after.
+        """
         if not url:
-            url = f'https://{MUSIC_LEAGUE_DOMAIN}/l/{config["MUSIC_LEAGUE_ID"]}/'  # noqa
-        resp = self.ml_session.get(url)
-        if not resp.ok:
-            raise ValueError(resp.text)
-
-        league_dom = BeautifulSoup(resp.text, 'html.parser')
-        title = league_dom.find(class_="league-title").string
+            url = f'{MUSIC_LEAGUE_URL}/l/{config["MUSIC_LEAGUE_ID"]}/'
+        if ttl is None:
+            ttl = config.get('ML_LEAGUE_TTL', 300)
+        text = self._get(url, ttl=ttl)
+        with profiler.span('ml.parse_league'):
+            title, rounds = self.parser.parse_league(text)
 
         completed_rounds = []
-        completed_rounds_dom = league_dom.find_all(class_="round-bar complete")
-        for rnd in completed_rounds_dom:
-            round_title = rnd.find(class_="round-title").string
-            playlist_link = rnd.find(class_="playlist").parent['href']
-            result_link = rnd.find(class_="results").parent['href']
+        for round_title, playlist_link, result_link in rounds:
+            round_url = f'{MUSIC_LEAGUE_URL}{result_link}'
             completed_rounds.append(
                 MLRound(
                     title=round_title, playlist_link=playlist_link,
                     _result={
-                        'parser': self.parse_round,
-                        'round_url': (
-                            f'https://{MUSIC_LEAGUE_DOMAIN}{result_link}')
-                    }
+                        'parser': partial(self.parse_round, completed=True),
+                        'round_url': round_url
+                    },
+                    round_url=round_url
                 )
             )
         return MLLeague(title=title, completed_rounds=completed_rounds)
 
-    def parse_round(self, url):
-        resp = self.ml_session.get(url)
-        if not resp.ok:
-            raise ValueError(resp.text)
-        bs = BeautifulSoup(resp.text, 'html.parser')
-
-        title = bs.find(class_="round-title").string
-
-        tracks = []
-        track_doms = bs.find_all(class_="song")
-        for track_dom in track_doms:
-            song_info = track_dom.find(class_="song-info")
-            img_url = track_dom.img['src']
-            name, artist = (
-                self._extract_classes_string(
-                    song_info, "name", "artist"))
-            link = song_info.find(class_="name")['href']
-            submitted_by = song_info.\
-                find(class_="submitter").contents[1].string
-            artist = remove_prefix(artist, "by ")
-
-            comment_doms = track_dom.find_all(class_="comment")
-            comments = {}
-            for comment_dom in comment_doms:
-                commenter = remove_prefix(
-                    comment_dom.find(class_="commenter").string, "- ")
-                comment = comment_dom.next_element
-                comments[commenter] = comment
-
-            upvote_doms = track_dom.find_all(class_="upvote")
-            upvotes = {}
-            for upvote in upvote_doms:
-                score, voter = self._extract_classes_string(
-                    upvote, "vote-count", "voter")
-                score = int(score)
-                upvotes[voter] = score
-
-            track = MLTrack(
-                name=name, img_url=img_url, submitted_by=submitted_by,
-                link=link, artist=artist, comments=comments, upvotes=upvotes)
-            tracks.append(track)
-
-        return MLRoundResult(title=title, tracks=tracks)
-
-    def __init__(self):
-        browser_name = config['BROWSER_NAME'].lower()
-        cookie_reader = getattr(browser_cookie3, browser_name)
-        cookies = cookie_reader(domain_name=MUSIC_LEAGUE_DOMAIN)
-
-        self.ml_session = requests.Session()
-        self.ml_session.cookies = cookies
+    def parse_round(self, url, completed=False):
+        """ Parses the round results page. Results of completed rounds never
+            change, so they are cached permanently, and in parsed form.
+        """
+        if completed:
+            parsed = self.cache.get_parsed(url)
+            if parsed:
+                profiler.count('cache.ml_round.hit')
+                title, rows = parsed
+                return MLRoundResult(
+                    title=title, tracks=[MLTrack(*row) for row in rows])
+
+        text = self._get(url, permanent=completed)
+        with profiler.span('ml.parse_round'):
+            title, tracks = self.parser.parse_round(text)
+        result = MLRoundResult(
+            title=title, tracks=[MLTrack(**track) for track in tracks])
+        if completed:
+            track_fields = [f.name for f in fields(MLTrack)]
+            self.cache.put_parsed(url, [title, [
+                [getattr(t, name) for name in track_fields]
+                for t in result.tracks]])
+        return result
+
+    def _get(self, url, **kwargs):
+        """ GETs the page through the response cache, logging in again with
+            the browser cookies when the saved session expired.
+        """
+        return self.session_store.get(
+            lambda session: cached_get(session, self.cache, url, **kwargs))
+
+    def __init__(self, parser=None):
+        self.session_store = MLSessionStore.shared(MUSIC_LEAGUE_DOMAIN)
+        self.ml_session = self.session_store.session
+        self.parser = get_parser_backend(parser)
+        self.cache = ResponseCache()
@@ -0,0 +1,169 @@
+import bisect
+import fnmatch
+import json
+import sqlite3
+import threading
+import time
+
+from .cache import DEFAULT_CACHE_PATH
+from .config import config
+
+
+def trigrams(text):
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PlaylistDirectory:
+    """ Names and IDs of every playlist the user follows, loaded once per
+        process and persisted between runs. The saved listing is reused while
+        the total count and the snapshot IDs of the first page are unchanged,
+        for at most `PLAYLIST_DIRECTORY_TTL` seconds: changes past the first
+        page, like a renamed older playlist, only show up after that or a
+        `refresh(full=True)`. Names are indexed for exact, prefix and
+        substring lookup, fuzzy matches are only offered as suggestions.
+    """
+    page_size = 50
+    fuzzy_threshold = 0.3
+    default_ttl = 24 * 3600
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, spotify_client):
+        """ The process-wide directory, loaded on first use.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(spotify_client)
+            return cls._shared
+
+    def __init__(self, spotify_client, path=None):
+        self.spotify_client = spotify_client
+        path = path or config.get('CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS playlist_directory (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    data TEXT NOT NULL
+                )""")
+        self.ttl = config.get('PLAYLIST_DIRECTORY_TTL', self.default_ttl)
+        self.lock = threading.Lock()
+        self.refresh()
+
+    @staticmethod
+    def _compact(playlist):
+        return {'id': playlist['id'], 'name': playlist['name'],
+                'snapshot_id': playlist.get('snapshot_id')}
+
+    def _load_saved(self):
+        row = self.db.execute(
+            "SELECT data FROM playlist_directory WHERE id = 0").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, data):
+        with self.db:
+            self.db.execute(
+                "REPLACE INTO playlist_directory VALUES (0, ?)",
+                (json.dumps(data),))
+
+    def refresh(self, full=False):
+        """ Revalidates the listing with a single page request and relists
+            every playlist only when the first page changed, the listing is
+            older than the TTL or `full` is set.
+        """
+        first_page = self.spotify_client.playlists_page(limit=self.page_size)
+        first_items = [self._compact(p) for p in first_page['items']]
+
+        saved = None if full else self._load_saved()
+        if (saved and saved['total'] == first_page['total']
+                and saved['playlists'][:len(first_items)] == first_items
+                and time.time() - saved.get('listed_at', 0) < self.ttl):
+            playlists = saved['playlists']
+        else:
+            listed_at = time.time()
+            playlists = [self._compact(p)
+                         for p in self.spotify_client.all_playlists()]
+            self._save({'total': first_page['total'],
+                        'listed_at': listed_at,
+                        'playlists': playlists})
+        with self.lock:
+            self._build_index(playlists)
+
+    def _build_index(self, playlists):
+        self.playlists = playlists
+        self.by_name = {}
+        for i, p in enumerate(playlists):
+            self.by_name.setdefault(p['name'].lower(), []).append(i)
+        self.sorted_names = sorted(
+            (p['name'].lower(), i) for i, p in enumerate(playlists))
+        self.name_trigrams = [trigrams(p['name']) for p in playlists]
+        self.by_trigram = {}
+        for i, grams in enumerate(self.name_trigrams):
+            for gram in grams:
+                self.by_trigram.setdefault(gram, set()).add(i)
+
+    def exact(self, name):
+        return [self.playlists[i] for i in self.by_name.get(name.lower(), [])]
+
+    def prefix(self, prefix):
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.sorted_names, (prefix, -1))
+        matched = []
+        for name, i in self.sorted_names[start:]:
+            if not name.startswith(prefix):
+                break
+            matched.append(i)
+        return [self.playlists[i] for i in sorted(matched)]
+
+    def substring(self, text):
+        text = text.lower()
+        candidates = range(len(self.playlists))
+        # Every trigram of the text appears in the names containing it.
+        grams = {text[i:i + 3] for i in range(len(text) - 2)}
+        if grams:
+            candidates = sorted(set.intersection(*(
+                self.by_trigram.get(g, set()) for g in grams)))
+        return [self.playlists[i] for i in candidates
+                if text in self.playlists[i]['name'].lower()]
+
+    def fuzzy(self, text, limit=5):
+        grams = trigrams(text)
+        scores = {}
+        for gram in grams:
+            for i in self.by_trigram.get(gram, ()):
+                scores[i] = scores.get(i, 0) + 1
+        ranked = []
+        for i, shared in scores.items():
+            similarity = shared / len(grams | self.name_trigrams[i])
+            if similarity >= self.fuzzy_threshold:
+                ranked.append((-similarity, i))
+        return [self.playlists[i] for _, i in sorted(ranked)[:limit]]
+
+    def glob(self, pattern):
+        """ Playlists whose name matches the shell-style pattern, ignoring
+            case, in listing order.
+        """
+        pattern = pattern.lower()
+        with self.lock:
+            return [p for p in self.playlists
+                    if fnmatch.fnmatchcase(p['name'].lower(), pattern)]
+
+    def find(self, name):
+        """ Best match for `name`: exact, then prefix and substring matches.
+            Ties go to the playlist listed first.
+        """
+        with self.lock:
+            for lookup in (self.exact, self.prefix, self.substring):
+                matched = lookup(name)
+                if matched:
+                    return matched[0]
+        return None
+
+    def suggest(self, name, limit=5):
+        """ Names of the playlists closest to `name`, for error messages.
+        """
+        with self.lock:
+            return [p['name'] for p in self.fuzzy(name, limit)]
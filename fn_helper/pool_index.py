@@ -0,0 +1,209 @@
+import re
+import sqlite3
+import threading
+import unicodedata
+
+from .cache import DEFAULT_CACHE_PATH
+from .config import config
+from .spotify_util import get_url
+from .util import id_from_uri
+
+# Decorations that differ between releases of the same recording.
+_VERSION_WORDS = (r"remaster(ed)?|deluxe|anniversary|bonus|mono|stereo|"
+                  r"radio edit|(single|album) version|feat\.?|ft\.?|with")
+_BRACKETED = re.compile(
+    r"[(\[（【][^)\]）】]*\b(%s)\b[^)\]）】]*[)\]）】]" % _VERSION_WORDS,
+    re.IGNORECASE)
+_DASH_SUFFIX = re.compile(
+    r"\s+-\s+.*\b(%s)\b.*$" % _VERSION_WORDS, re.IGNORECASE)
+# Live recordings differ from the studio one, whatever else the suffix says.
+_LIVE = re.compile(r"\blive\b", re.IGNORECASE)
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def _strip_decoration(match):
+    return match.group(0) if _LIVE.search(match.group(0)) else ''
+
+
+def normalize_title(title):
+    """ Strips remaster/edition/feat. decorations so re-releases share a key.
+        Live versions are different recordings and keep their own key, so
+        decorations mentioning `live` are kept.
+    """
+    title = unicodedata.normalize('NFKC', title or '')
+    title = _BRACKETED.sub(_strip_decoration, title)
+    title = _DASH_SUFFIX.sub(_strip_decoration, title)
+    return normalize_text(title)
+
+
+def title_key(artist, title):
+    return f"{normalize_text(artist)}|{normalize_title(title)}"
+
+
+def entry_from_item(item):
+    """ Builds an index entry out of a playlist track item.
+    """
+    track = item.get('track') or {}
+    artists = track.get('artists') or [{}]
+    if not track.get('name'):
+        return {'track_id': track.get('id'), 'name': None, 'isrc': None,
+                'title_key': None}
+    isrc = (track.get('external_ids') or {}).get('isrc')
+    return {
+        'track_id': track.get('id'),
+        'name': track.get('name'),
+        'isrc': isrc.upper() if isrc else None,
+        'title_key': title_key(artists[0].get('name'), track.get('name')),
+    }
+
+
+class PoolIndex:
+    """ Persistent index of the tracks in the `ALL_POOL` playlist by track ID,
+        ISRC and normalized (artist, title). The index is kept current by
+        fetching only the tracks appended since the last sync.
+    """
+    # Tracks per page of the Spotify API, and per stored batch.
+    page_size = 100
+
+    def __init__(self, path=None, pool_playlist_id=None):
+        self.pool_playlist_id = (pool_playlist_id
+                                 or id_from_uri(config['ALL_POOL']))
+        path = path or config.get('CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS pool_entries (
+                    pool_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    track_id TEXT,
+                    name TEXT,
+                    isrc TEXT,
+                    title_key TEXT,
+                    PRIMARY KEY (pool_id, position)
+                );
+                CREATE INDEX IF NOT EXISTS pool_track_id
+                    ON pool_entries (pool_id, track_id);
+                CREATE INDEX IF NOT EXISTS pool_isrc
+                    ON pool_entries (pool_id, isrc);
+                CREATE INDEX IF NOT EXISTS pool_title_key
+                    ON pool_entries (pool_id, title_key);
+                CREATE TABLE IF NOT EXISTS pool_state (
+                    pool_id TEXT PRIMARY KEY,
+                    snapshot_id TEXT NOT NULL
+                );""")
+
+    @property
+    def snapshot_id(self):
+        """ Snapshot of the pool playlist the index reflects.
+        """
+        row = self.db.execute(
+            "SELECT snapshot_id FROM pool_state WHERE pool_id = ?",
+            (self.pool_playlist_id,)).fetchone()
+        return row[0] if row else None
+
+    def _count(self):
+        return self.db.execute(
+            "SELECT COUNT(*) FROM pool_entries WHERE pool_id = ?",
+            (self.pool_playlist_id,)).fetchone()[0]
+
+    def _track_id_at(self, position):
+        row = self.db.execute(
+            "SELECT track_id FROM pool_entries "
+            "WHERE pool_id = ? AND position = ?",
+            (self.pool_playlist_id, position)).fetchone()
+        return row[0] if row else None
+
+    def _store(self, items, start, snapshot_id, rebuild=False):
+        """ Stores the items a page at a time as they are received. No
+            transaction is held open while the next page is awaited, so the
+            track cache can write to the same database meanwhile. The
+            snapshot is recorded last: an interrupted rebuild leaves a prefix
+            of the pool, which the next sync extends like an appended tail.
+        """
+        if rebuild:
+            with self.db:
+                self.db.execute(
+                    "DELETE FROM pool_entries WHERE pool_id = ?",
+                    (self.pool_playlist_id,))
+        rows = []
+        for position, item in enumerate(items, start):
+            # Unavailable tracks still hold a position in the pool.
+            entry = entry_from_item(item or {})
+            rows.append((self.pool_playlist_id, position, entry['track_id'],
+                         entry['name'], entry['isrc'], entry['title_key']))
+            if len(rows) == self.page_size:
+                with self.db:
+                    self._insert(rows)
+                rows = []
+        with self.db:
+            self._insert(rows)
+            self.db.execute(
+                "REPLACE INTO pool_state VALUES (?, ?)",
+                (self.pool_playlist_id, snapshot_id))
+
+    def _insert(self, rows):
+        self.db.executemany(
+            "REPLACE INTO pool_entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def sync(self, spotify_client):
+        """ Brings the index up to date with the pool playlist. Costs a single
+            metadata request when the pool has not changed.
+        """
+        with self.lock:
+            metadata = spotify_client.get_playlist(
+                self.pool_playlist_id, fields='snapshot_id,tracks.total')
+            snapshot_id = metadata['snapshot_id']
+            if snapshot_id == self.snapshot_id:
+                return
+
+            total = metadata['tracks']['total']
+            count = self._count()
+            if 0 < count <= total:
+                # The pool is append-only in practice, fetch the tail and
+                # check the last indexed track is still where we left it.
+                items = spotify_client.iter_paginated(
+                    get_url('tracks', playlist_id=self.pool_playlist_id),
+                    params={'offset': count - 1, 'limit': self.page_size})
+                last = (next(items, None) or {}).get('track')
+                if last and last.get('id') == self._track_id_at(count - 1):
+                    self._store(items, count, snapshot_id)
+                    return
+                items.close()
+
+            items = spotify_client.iter_tracks_in_playlist(
+                self.pool_playlist_id, metadata=metadata)
+            self._store(items, 0, snapshot_id, rebuild=True)
+
+    def track_uris(self):
+        """ URIs of the Spotify tracks in the pool.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT track_id FROM pool_entries "
+                "WHERE pool_id = ? AND track_id IS NOT NULL",
+                (self.pool_playlist_id,)).fetchall()
+        return {f"spotify:track:{track_id}" for track_id, in rows}
+
+    def lookup(self, entry):
+        """ Returns `(reason, pool_track_name)` for the first pool entry
+            matching the entry by track ID, ISRC or (artist, title), or None.
+        """
+        for column in ('track_id', 'isrc', 'title_key'):
+            value = entry.get(column)
+            if not value:
+                continue
+            with self.lock:
+                row = self.db.execute(
+                    f"SELECT name FROM pool_entries "
+                    f"WHERE pool_id = ? AND {column} = ? LIMIT 1",
+                    (self.pool_playlist_id, value)).fetchone()
+            if row:
+                return column, row[0]
+        return None
+
@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+              float('inf'))
+
+_SPOTIFY_ID = re.compile(r'/[0-9A-Za-z]{22}(?=/|$)')
+
+
+def endpoint_of(method, url):
+    """ Endpoint label of a request with IDs masked, e.g.
+        `GET api.spotify.com/v1/playlists/{id}/tracks`.
+    """
+    parsed = urlparse(url)
+    return f"{method} {parsed.netloc}{_SPOTIFY_ID.sub('/{id}', parsed.path)}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.total += ms
+        self.count += 1
+        self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        """ Upper bound of the bucket holding the q-th percentile.
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': round(self.max, 3),
+            'buckets': {str(bound): count for bound, count
+                        in zip(BUCKETS_MS, self.counts) if count},
+        }
+
+
+class Profiler:
+    """ Collects request latency, bytes, retries and parse time. Disabled by
+        default, recording is then a no-op.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.perf_counter()
+        self.requests = {}
+        self.spans = {}
+        self.counters = {}
+        self.events = []
+
+    def enable(self):
+        self.enabled = True
+        self.reset()
+
+    def _event(self, name, category, started, duration, args=None):
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': round((started - self.started_at) * 1e6),
+            'dur': round(duration * 1e6), 'pid': os.getpid(),
+            'tid': threading.get_ident(), 'args': args or {}})
+
+    def record_request(self, method, url, status, started, size):
+        if not self.enabled:
+            return
+        duration = time.perf_counter() - started
+        endpoint = endpoint_of(method, url)
+        with self.lock:
+            stats = self.requests.setdefault(
+                endpoint, {'latency': Histogram(), 'bytes': 0, 'errors': 0})
+            stats['latency'].add(duration * 1000)
+            stats['bytes'] += size
+            if status >= 400:
+                stats['errors'] += 1
+            self._event(endpoint, 'request', started, duration,
+                        {'status': status, 'bytes': size})
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name):
+        """ Times the block, e.g. parsing, under `name`.
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            with self.lock:
+                self.spans.setdefault(name, Histogram()).add(duration * 1000)
+                self._event(name, 'span', started, duration)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'wall_time_s': round(
+                    time.perf_counter() - self.started_at, 3),
+                'requests': {
+                    endpoint: dict(stats['latency'].to_dict(),
+                                   bytes=stats['bytes'],
+                                   errors=stats['errors'])
+                    for endpoint, stats in sorted(self.requests.items())},
+                'spans': {name: histogram.to_dict()
+                          for name, histogram in sorted(self.spans.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def summary(self):
+        data = self.to_dict()
+        lines = [f"Wall time: {data['wall_time_s']}s", "",
+                 f"{'requests':60} {'count':>6} {'mean ms':>9} "
+                 f"{'p95 ms':>8} {'KiB':>9}"]
+        for endpoint, stats in data['requests'].items():
+            lines.append(
+                f"{endpoint[:60]:60} {stats['count']:6} "
+                f"{stats['mean_ms']:9.1f} {stats['p95_ms']:8.1f} "
+                f"{stats['bytes'] / 1024:9.1f}")
+        if data['spans']:
+            lines += ["", f"{'spans':60} {'count':>6} {'mean ms':>9} "
+                      f"{'p95 ms':>8}"]
+            for name, stats in data['spans'].items():
+                lines.append(
+                    f"{name[:60]:60} {stats['count']:6} "
+                    f"{stats['mean_ms']:9.1f} {stats['p95_ms']:8.1f}")
+        if data['counters']:
+            lines += [""] + [f"{name}: {value}" for name, value
+                             in data['counters'].items()]
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_chrome_trace(self, path):
+        """ Writes a trace loadable in chrome://tracing or Perfetto.
+        """
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events}, f)
+
+
+profiler = Profiler()
@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+
+import requests
+
+from .config import config
+from .profiling import profiler
+
+# Status codes that are worth retrying after a pause.
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+# Methods safe to send twice. Others (adding or moving tracks) may already
+# have been applied when a 5xx or a dropped connection comes back, so they
+# are only retried when Spotify rejected them or they were never sent.
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class TokenBucket:
+    """ Thread-safe token bucket, `rate` tokens are refilled per second up to
+        `capacity`.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Takes a token, blocking until one is available. Returns the time
+            spent waiting in seconds.
+        """
+        waited = 0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RequestScheduler:
+    """ Schedules HTTP requests under a token bucket quota, retries transient
+        errors with jittered exponential backoff and honors `Retry-After`.
+        The quota defaults to `SPOTIFY_RATE_LIMIT` requests per second with
+        bursts of `SPOTIFY_BURST`, read when the first request is sent.
+    """
+
+    def __init__(self, rate=None, burst=None, max_retries=5,
+                 backoff_base=0.5, backoff_cap=30):
+        self.rate = rate
+        self.burst = burst
+        self._bucket = None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # While set, no request is sent before this monotonic time.
+        self.paused_until = 0
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0,
+                      'wait_time': 0.0}
+
+    @property
+    def bucket(self):
+        with self.lock:
+            if self._bucket is None:
+                rate = self.rate or config.get('SPOTIFY_RATE_LIMIT', 10)
+                burst = self.burst or config.get('SPOTIFY_BURST', 20)
+                self._bucket = TokenBucket(rate, burst)
+            return self._bucket
+
+    def _count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, delay)
+
+    def _retry_after(self, resp):
+        try:
+            return float(resp.headers.get('Retry-After', ''))
+        except ValueError:
+            return None
+
+    def _pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(
+                self.paused_until, time.monotonic() + seconds)
+
+    def _wait_for_slot(self):
+        waited = 0
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            waited += delay
+        waited += self.bucket.acquire()
+        if waited:
+            self._count('wait_time', waited)
+
+    def request(self, method, *args, **kwargs):
+        """ Sends the request with `method` (e.g. `session.get`) and returns
+            the response once it is not transient or retries run out.
+            Non-idempotent requests are only retried after a 429 or a
+            connection that could not be established.
+        """
+        idempotent = method.__name__.upper() in IDEMPOTENT_METHODS
+        retried_errors = (requests.ConnectionError if idempotent
+                          else requests.ConnectTimeout)
+        retried_status_codes = (TRANSIENT_STATUS_CODES if idempotent
+                                else {429})
+        attempt = 0
+        while True:
+            self._wait_for_slot()
+            self._count('requests')
+            started = time.perf_counter()
+            try:
+                resp = method(*args, **kwargs)
+            except retried_errors:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                profiler.record_request(
+                    method.__name__.upper(), resp.url, resp.status_code,
+                    started, len(resp.content))
+                if (resp.status_code not in retried_status_codes
+                        or attempt >= self.max_retries):
+                    return resp
+                delay = self._retry_after(resp)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if resp.status_code == 429:
+                    self._count('rate_limited')
+                    profiler.count('spotify.rate_limited')
+                    # Rate limits apply to the whole app, hold every worker.
+                    self._pause(delay)
+            self._count('retries')
+            self._count('wait_time', delay)
+            profiler.count('spotify.retries')
+            time.sleep(delay)
+            attempt += 1
+
+
+# Shared by every SpotifyClient so concurrent clients honor the same quota.
+spotify_scheduler = RequestScheduler()
@@ -1,14 +1,26 @@
+import dbm
+import json
+import os.path
 import re
 import shelve
+import tempfile
+import threading
 from base64 import b64encode
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any
 from urllib.parse import urlencode
 from uuid import uuid4
 
 import requests
-from flask import Flask, redirect, request
 
+from .cache import PlaylistCache
+from .playlist_directory import PlaylistDirectory
+from .profiling import profiler
+from .scheduler import spotify_scheduler
 from .util import ElementIterator, chunk_gen, id_from_uri, is_uri
 from .config import config
 
@@ -16,6 +28,7 @@ from .config import config
 URLS = {
     'auth': 'https://accounts.spotify.com/authorize',
     'token': 'https://accounts.spotify.com/api/token',
+    'me': 'https://api.spotify.com/v1/me',
     'playlists': 'https://api.spotify.com/v1/me/playlists',
     'playlist': 'https://api.spotify.com/v1/playlists/{playlist_id}',
     'tracks': 'https://api.spotify.com/v1/playlists/{playlist_id}/tracks',
@@ -28,52 +41,88 @@ def get_url(endpoint, **kwargs):
     return URLS[endpoint].format(**kwargs)
 
 
-@dataclass
 class Track:
-    id: str
-    name: str
-    submitted_by: str
-    spotify_uri: str
-    raw_data: dict
+    """ Compact playlist track keeping only the fields we use. The full item
+        JSON is available through `Playlist.raw_tracks()`.
+    """
+    __slots__ = ('id', 'name', 'submitted_by', 'spotify_uri')
+
+    def __init__(self, id, name, submitted_by, spotify_uri):
+        self.id = id
+        self.name = name
+        self.submitted_by = submitted_by
+        self.spotify_uri = spotify_uri
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(id=item["track"]["id"],
+                   name=item["track"]["name"],
+                   submitted_by=item["added_by"]["id"],
+                   spotify_uri=item["track"]["uri"])
+
+    def __eq__(self, other):
+        if not isinstance(other, Track):
+            return NotImplemented
+        return all(getattr(self, attr) == getattr(other, attr)
+                   for attr in self.__slots__)
+
+    def __repr__(self):
+        return "Track(%s)" % ", ".join(
+            f"{attr}={getattr(self, attr)!r}" for attr in self.__slots__)
 
 
 @dataclass
 class Playlist:
     id: str
     name: str
-    _tracks: list
+    _tracks: Any
     raw_data: dict
 
     @property
     def tracks(self):
-        if isinstance(self._tracks, list):
-            return self._tracks
-        tracks = self._tracks['parser'](self._tracks['track_url'])
-        return list(map(self.parse_track, tracks))
-
-    def parse_track(self, track):
-        return Track(id=track["track"]["id"],
-                     name=track["track"]["name"],
-                     submitted_by=track["added_by"]["id"],
-                     spotify_uri=track["track"]["uri"],
-                     raw_data=track)
+        """ Tracks parsed once and memoized.
+        """
+        if not isinstance(self._tracks, list):
+            self._tracks = [Track.from_item(t) for t in self.raw_tracks()
+                            if t and t.get('track')]
+        return self._tracks
+
+    def raw_tracks(self):
+        """ Full track items JSON, served from the track cache.
+        """
+        return self._tracks_source['parser'](
+            self._tracks_source['track_url'])
+
+    def __post_init__(self):
+        self._tracks_source = (self._tracks
+                               if isinstance(self._tracks, dict) else None)
+
+    @property
+    def checkpoint_id(self):
+        return self.id
 
     def __str__(self):
         return self.name
 
 
 class SpotifyNerdPlaylistIterator(ElementIterator):
-    def __init__(self):
-        matcher = re.compile(r"(\d{1,2}/\d{1,2} ?肥宅聽歌團)")
-        excluder = re.compile(r"[Rr]ound ?\d+")
-        self.spotify_client = SpotifyClient()
-        all_playlists = self.spotify_client.all_playlists()
-        matched = filter(lambda p: matcher.search(p['name']), all_playlists)
-        matched = filter(
-            lambda p: not bool(excluder.search(p['name'])), matched)
+    matcher = re.compile(r"(\d{1,2}/\d{1,2} ?肥宅聽歌團)")
+    excluder = re.compile(r"[Rr]ound ?\d+")
+
+    def __init__(self, spotify_client=None):
+        self.spotify_client = spotify_client or SpotifyClient()
+        all_playlists = PlaylistDirectory.shared(
+            self.spotify_client).playlists
+        matched = filter(lambda p: self.is_nerd_playlist(p['name']),
+                         all_playlists)
         self.elements = list(map(self.parse_playlist, matched))
         self.elements.reverse()
 
+    @classmethod
+    def is_nerd_playlist(cls, name):
+        return bool(cls.matcher.search(name)
+                    and not cls.excluder.search(name))
+
     def parse_playlist(self, p):
         return Playlist(
             id=p['id'],
@@ -83,10 +132,25 @@ class SpotifyNerdPlaylistIterator(ElementIterator):
             raw_data=p)
 
 
-class SpotifyAuthClient:
+class SpotifyAuthClient(requests.auth.AuthBase):
     """ AuthClient facilitates oauth access_token retrieving and refreshing.
-        Use AuthClient().get_auth_header() to retrieve header for Http header.
+        One process-wide instance, `SpotifyAuthClient.shared()`, loads the
+        token once and refreshes it shortly before it expires, one refresh at
+        a time across threads. It is used as the `auth` of request sessions,
+        or use get_auth_header() to retrieve header for Http header.
     """
+    # Refresh this long before the token expires.
+    refresh_margin = timedelta(seconds=60)
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
 
     @property
     def _get_authorization_header(self):
@@ -98,7 +162,7 @@ class SpotifyAuthClient:
 
     def _handle_token_response(self, token_response):
         """ Handle access_token and refresh access_token response and save
-            the attributes to shelve db.
+            the attributes to the token file.
         """
         if not token_response.ok:
             raise ValueError(str(token_response.json()))
@@ -110,10 +174,44 @@ class SpotifyAuthClient:
             self.token['refresh_token'] = token_response['refresh_token']
         expires_in = token_response['expires_in']
         self.token['expiry'] = datetime.now() + timedelta(seconds=expires_in)
+        self._save_token()
+
+    def _load_token(self):
+        """ Loads the token file, or the shelve db used by earlier versions.
+        """
+        if os.path.exists(self.token_path):
+            with open(self.token_path) as f:
+                token = json.load(f)
+            token['scope'] = set(token['scope'])
+            token['expiry'] = datetime.fromtimestamp(token['expiry'])
+            return token
+        try:
+            with shelve.open('oauth2_token.db', flag='r') as legacy_token:
+                return dict(legacy_token)
+        except dbm.error:
+            return {}
+
+    def _save_token(self):
+        """ Writes the token file atomically, readable by the owner only.
+        """
+        token = dict(self.token, scope=sorted(self.token['scope']),
+                     expiry=self.token['expiry'].timestamp())
+        directory = os.path.dirname(os.path.abspath(self.token_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(token, f)
+            os.replace(tmp_path, self.token_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
 
     def _run_oauth_client(self, session):
-        """ Run a Flask App to handle Spotify OAuth Callback.
+        """ Run a Flask App to handle Spotify OAuth Callback. Flask is only
+            imported when the authorization flow runs.
         """
+        from flask import Flask, redirect, request
+
         app = Flask('OAuth Client')
         host = config['OAUTH_CLIENT_HOST']
         port = config['OAUTH_CLIENT_PORT']
@@ -162,7 +260,7 @@ class SpotifyAuthClient:
 
     def _refresh_access_token(self, session):
         """ Refreshes access_token and saves the new access_token,
-            refresh_token, expiry to shelve db.
+            refresh_token, expiry to the token file.
         """
         token_request_body = {
             'grant_type': "refresh_token",
@@ -183,50 +281,120 @@ class SpotifyAuthClient:
         print(f"Visit {auth_uri} and complete the authorization flow")
         self._run_oauth_client(session)
 
+    @property
+    def access_token(self):
+        """ The current access_token, refreshed first when about to expire.
+        """
+        if self.token['expiry'] - self.refresh_margin <= datetime.now():
+            self.refresh(self.token['access_token'])
+        return self.token['access_token']
+
+    def refresh(self, stale_access_token):
+        """ Refreshes the token unless another thread already replaced the
+            stale one.
+        """
+        with self.lock:
+            if self.token['access_token'] == stale_access_token:
+                self._refresh_access_token(self.auth_session)
+
     def get_auth_header(self):
         """ Get authentication header dict for spotify request session.
         """
         return {'Authorization': "Bearer %s" % self.access_token}
 
+    def __call__(self, r):
+        r.headers.update(self.get_auth_header())
+        return r
+
     def __init__(self):
-        try:
-            self.token = shelve.open('oauth2_token.db', writeback=True)
-            auth_session = requests.Session()
-            auth_session.session_id = uuid4().hex
-            if not self.token.get('access_token'):
-                self._auth_flow(auth_session)
-            elif self.token.get('expiry') <= datetime.now():
-                self._refresh_access_token(auth_session)
-            self.access_token = self.token['access_token']
-        finally:
-            self.token.sync()
-            self.token.close()
-            delattr(self, 'token')
+        self.token_path = config.get('TOKEN_PATH', 'oauth2_token.json')
+        self.lock = threading.Lock()
+        self.auth_session = requests.Session()
+        self.auth_session.session_id = uuid4().hex
+        self.token = self._load_token()
+        if not self.token.get('access_token'):
+            self._auth_flow(self.auth_session)
+        elif not os.path.exists(self.token_path):
+            self._save_token()
 
 
 class SpotifyClient:
+    # Upper bound of requests in flight for concurrent pagination.
+    max_workers = 8
+    scheduler = spotify_scheduler
+
     def handle_request(self, method, *args, **kwargs):
-        """ Handles HTTP response erros.
-            TODO: Better handler
+        """ Sends the request through the shared scheduler, which retries
+            rate limited and transient errors, then handles HTTP errors.
+            A request rejected with 401 is retried once with a new token.
         """
-        resp = method(*args, **kwargs)
-        result = resp.json()
+        resp = self.scheduler.request(method, *args, **kwargs)
+        if resp.status_code == 401:
+            stale_token = resp.request.headers['Authorization'].split()[-1]
+            self.auth.refresh(stale_token)
+            resp = self.scheduler.request(method, *args, **kwargs)
         if not resp.ok:
-            raise ValueError(str(result))
-        return result
+            raise ValueError(f"{resp.status_code}: {resp.text}")
+        if not resp.content:
+            return {}
+        return resp.json()
 
-    def paginate_through(self, url, params=None):
+    def paginate_through(self, url, params=None, concurrent=False):
         """ Paginates through a paginated object listing with the starter url.
+            With `concurrent`, the remaining pages are worked out from the
+            `total` and `limit` of the first page and fetched in parallel.
+        """
+        if params is None:
+            params = {'limit': 50}
+        if concurrent:
+            return list(self.iter_paginated(url, params))
+
+        with profiler.span('spotify.paginate'):
+            results = []
+            while url:
+                resp = self.handle_request(
+                    self.spotify_session.get, url, params=params)
+                results.extend(resp['items'])
+                url = resp.get('next')
+            return results
+
+    def iter_paginated(self, url, params=None):
+        """ Yields the items of a paginated listing page by page. After the
+            first page, up to `max_workers` following pages are fetched in
+            the background by offset while the current one is consumed. The
+            `spotify.paginate` span lasts until the listing is exhausted or
+            closed, including the time spent consuming it.
         """
-        results = []
         if params is None:
             params = {'limit': 50}
-        while url:
-            resp = self.handle_request(
-                self.spotify_session.get, url, params=params)
-            results.extend(resp['items'])
-            url = resp.get('next')
-        return results
+        with profiler.span('spotify.paginate'):
+            yield from self._iter_pages(url, params)
+
+    def _iter_pages(self, url, params):
+        first_page = self.handle_request(
+            self.spotify_session.get, url, params=params)
+        yield from first_page['items']
+        limit = first_page.get('limit') or len(first_page['items'])
+        if not first_page.get('next') or not limit:
+            return
+
+        start = first_page.get('offset', 0) + limit
+        offsets = iter(range(start, first_page['total'], limit))
+
+        def fetch_page(offset):
+            page_params = dict(params, offset=offset, limit=limit)
+            return self.handle_request(
+                self.spotify_session.get, url, params=page_params)['items']
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pages = deque(executor.submit(fetch_page, offset)
+                          for offset in islice(offsets, self.max_workers))
+            while pages:
+                items = pages.popleft().result()
+                offset = next(offsets, None)
+                if offset is not None:
+                    pages.append(executor.submit(fetch_page, offset))
+                yield from items
 
     def get_playlist_id(self, playlist):
         """ Retrieve a playlist by its URI or its name
@@ -236,28 +404,104 @@ class SpotifyClient:
             playlist_id = id_from_uri(playlist)
         # If in name format
         else:
-            all_playlists = self.all_playlists()
-            matched = next(
-                filter(lambda p: playlist in p['name'], all_playlists), {})
-            playlist_id = matched.get('id')
+            directory = PlaylistDirectory.shared(self)
+            matched = directory.find(playlist)
+            if not matched:
+                message = "No matching playlist found."
+                suggestions = directory.suggest(playlist)
+                if suggestions:
+                    message += f" Did you mean: {', '.join(suggestions)}?"
+                raise ValueError(message)
+            playlist_id = matched['id']
         if not playlist_id:
             raise ValueError("No matching playlist found.")
         return playlist_id
 
+    def playlists_page(self, offset=0, limit=50):
+        return self.handle_request(
+            self.spotify_session.get, get_url('playlists'),
+            params={'offset': offset, 'limit': limit})
+
     def all_playlists(self):
-        return self.paginate_through(get_url('playlists'))
+        return list(self.iter_playlists())
 
-    def all_tracks_in_playlist(self, playlist_id):
-        return self.paginate_through(
-            get_url('tracks', playlist_id=playlist_id),
-            params={'offset': 0, 'limit': 100})
+    def iter_playlists(self):
+        return self.iter_paginated(
+            get_url('playlists'), params={'offset': 0, 'limit': 50})
+
+    def current_user_id(self):
+        if self._user_id is None:
+            self._user_id = self.handle_request(
+                self.spotify_session.get, get_url('me'))['id']
+        return self._user_id
+
+    def get_playlist(self, playlist_id, fields='id,name,snapshot_id'):
+        """ Retrieves playlist metadata, by default only the cheap fields
+            needed to validate the track cache.
+        """
+        return self.handle_request(
+            self.spotify_session.get,
+            get_url('playlist', playlist_id=playlist_id),
+            params={'fields': fields})
+
+    def all_tracks_in_playlist(self, playlist_id, use_cache=True):
+        """ Lists all tracks in the playlist. Tracks are only downloaded when
+            the playlist's snapshot_id differs from the cached one.
+        """
+        return list(self.iter_tracks_in_playlist(playlist_id, use_cache))
+
+    def iter_tracks_in_playlist(self, playlist_id, use_cache=True,
+                                metadata=None):
+        """ Streaming `all_tracks_in_playlist`, items are yielded as soon as
+            their page arrives. Callers that already hold the playlist
+            metadata pass it along to save the request for its snapshot_id.
+        """
+        if use_cache:
+            metadata = metadata or self.get_playlist(playlist_id)
+            tracks = self.cache.get_tracks(
+                playlist_id, metadata['snapshot_id'])
+            if tracks is not None:
+                profiler.count('cache.playlist_tracks.hit')
+                yield from tracks
+                return
+            profiler.count('cache.playlist_tracks.miss')
+
+        tracks = []
+        for track in self.iter_paginated(
+                get_url('tracks', playlist_id=playlist_id),
+                params={'offset': 0, 'limit': 100}):
+            tracks.append(track)
+            yield track
+        if use_cache:
+            self.cache.put(
+                playlist_id, metadata['snapshot_id'], tracks, metadata)
 
     def add_tracks_to_playlist(self, tracks, playlist_id):
+        """ Appends the tracks, returning the playlist's new snapshot_id.
+        """
+        snapshot_id = None
         for chunk in chunk_gen(tracks):
-            self.handle_request(
+            snapshot_id = self.handle_request(
                 self.spotify_session.post,
                 get_url('tracks', playlist_id=playlist_id),
-                json={'uris': chunk})
+                json={'uris': chunk})['snapshot_id']
+        return snapshot_id
+
+    def cache_appended_tracks(self, playlist_id, tracks, appended,
+                              snapshot_id):
+        """ Caches the listing after `appended` tracks were added to the
+            `tracks` listed before, under the snapshot_id returned by the last
+            add. Only the appended tail is downloaded. The listing is not
+            cached when the tail does not add up, e.g. when the playlist was
+            changed concurrently. Returns the full listing.
+        """
+        tail = list(self.iter_paginated(
+            get_url('tracks', playlist_id=playlist_id),
+            params={'offset': len(tracks), 'limit': 100}))
+        listing = list(tracks) + tail
+        if len(tail) == appended:
+            self.cache.put(playlist_id, snapshot_id, listing)
+        return listing
 
     def update_playlist_tracks(self, playlist_id, **data):
         return self.handle_request(
@@ -265,5 +509,12 @@ class SpotifyClient:
             get_url('tracks', playlist_id=playlist_id), json=data)
 
     def __init__(self):
+        self.auth = SpotifyAuthClient.shared()
         self.spotify_session = requests.Session()
-        self.spotify_session.headers = SpotifyAuthClient().get_auth_header()
+        self.spotify_session.auth = self.auth
+        # Keep enough pooled connections alive for the concurrent workers.
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.spotify_session.mount('https://', adapter)
+        self.cache = PlaylistCache()
+        self._user_id = None
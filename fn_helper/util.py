@@ -31,10 +31,15 @@ def chunk_gen(seq, size=100):
         yield(seq[pos:pos + size])
 
 
+class CheckpointNotFound(ValueError):
+    pass
+
+
 class ElementIterator:
     n = 0
     current_element = None
     elements = []
+    _positions = None
 
     def __iter__(self):
         return self
@@ -48,12 +53,37 @@ class ElementIterator:
             self.n += 1
         return self.current_element
 
+    @staticmethod
+    def checkpoint_of(element):
+        """ Stable ID of the element, e.g. playlist ID or round URL.
+        """
+        return getattr(element, 'checkpoint_id', None) or str(element)
+
     @property
     def checkpoint(self):
-        return str(self.current_element)
+        return self.checkpoint_of(self.current_element)
+
+    @property
+    def positions(self):
+        """ Maps checkpoints, and titles for checkpoints saved before they
+            were stable IDs, to element positions.
+        """
+        if self._positions is None:
+            positions = {}
+            for i, element in enumerate(self.elements):
+                positions.setdefault(str(element), i)
+            for i, element in enumerate(self.elements):
+                positions[self.checkpoint_of(element)] = i
+            self._positions = positions
+        return self._positions
 
     def move_to_checkpoint(self, checkpoint):
         if not checkpoint:
             return
-        while self.checkpoint != checkpoint:
-            next(self)
+        if checkpoint not in self.positions:
+            raise CheckpointNotFound(
+                f"Checkpoint {checkpoint!r} not found in "
+                f"{len(self.elements)} elements.")
+        position = self.positions[checkpoint]
+        self.current_element = self.elements[position]
+        self.n = position + 1
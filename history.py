@@ -0,0 +1,86 @@
+import click
+
+from fn_helper import config
+from fn_helper.league_history import LeagueHistory
+
+
+def _nickname(handle):
+    nicknames = {m['ml_handle'].lower(): m['nickname']
+                 for m in config['MEMBERS'] if 'ml_handle' in m}
+    return nicknames.get(handle.lower(), handle)
+
+
+def _ingest():
+    """ Loads the completed rounds not in the local history yet. Results
+        are not prefetched, so ingested rounds are never fetched again.
+    """
+    from fn_helper import MLRoundIterator
+
+    history = LeagueHistory()
+    added = history.ingest(MLRoundIterator(prefetch=0))
+    print(f"Ingested {added} new rounds.")
+
+
+def _leaderboard(rounds=None):
+    rows = LeagueHistory().leaderboard(rounds)
+    print(f"{'member':20} {'score':>6} {'won':>4} {'played':>6}")
+    for submitter, score, won, played in rows:
+        print(f"{_nickname(submitter):20} {score:6} {won:4} {played:6}")
+
+
+def _averages(rounds=None):
+    rows = LeagueHistory().average_scores(rounds)
+    print(f"{'member':20} {'average':>8} {'tracks':>6}")
+    for submitter, average, count in rows:
+        print(f"{_nickname(submitter):20} {average:8.2f} {count:6}")
+
+
+def _affinity(rounds=None, normalize=False):
+    """ Prints who votes for whom, voters in rows and submitters in columns.
+    """
+    voters, submitters, matrix = LeagueHistory().affinity(rounds, normalize)
+    names = [_nickname(s)[:8] for s in submitters]
+    print(f"{'voter':20} " + " ".join(f"{name:>8}" for name in names))
+    for voter, row in zip(voters, matrix):
+        cells = [f"{points:8.2f}" if normalize else f"{points:8}"
+                 for points in row]
+        print(f"{_nickname(voter):20} " + " ".join(cells))
+
+
+rounds_option = click.option(
+    '--rounds', help="Only rounds whose title matches this glob, e.g. "
+                     "'*2023*'.")
+
+
+@click.group()
+def history():
+    pass
+
+
+@history.command()
+def ingest():
+    _ingest()
+
+
+@history.command()
+@rounds_option
+def leaderboard(rounds):
+    _leaderboard(rounds)
+
+
+@history.command()
+@rounds_option
+def averages(rounds):
+    _averages(rounds)
+
+
+@history.command()
+@rounds_option
+@click.option('--normalize', is_flag=True,
+              help="Show the share of each voter's points instead.")
+def affinity(rounds, normalize):
+    _affinity(rounds, normalize)
+
+
+if __name__ == '__main__':
+    history()
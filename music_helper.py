@@ -1,42 +1,79 @@
 import click
 
-from archive_playlists import _archive_playlists
-from check_dup import _check_dup
-from round_result import _round_result
-from setup import setup as _setup
-from shuffle_playlist import _shuffle_playlist
+from history import history
+from fn_helper.profiling import profiler
 
 
 @click.group()
-def music_helper():
-    pass
+@click.option('--profile', type=click.Choice(['summary', 'json', 'trace']),
+              help="Profile requests, parsing and caches. `json` and "
+                   "`trace` (Chrome trace) are written to --profile-output.")
+@click.option('--profile-output', type=click.Path(dir_okay=False),
+              help="Profile output file, defaults to profile.json.")
+@click.pass_context
+def music_helper(ctx, profile, profile_output):
+    if profile:
+        profiler.enable()
+        ctx.call_on_close(
+            lambda: _write_profile(profile, profile_output or 'profile.json'))
 
 
+def _write_profile(profile, path):
+    if profile == 'summary':
+        click.echo(profiler.summary(), err=True)
+    elif profile == 'json':
+        profiler.write_json(path)
+    else:
+        profiler.write_chrome_trace(path)
+
+
+# Subcommands import their implementation when invoked, so each command only
+# loads the clients and dependencies it uses.
 @music_helper.command()
-@click.argument('playlist', nargs=1)
-def check_dup(playlist):
-    _check_dup(playlist)
+@click.argument('playlists', nargs=-1, required=True)
+@click.option('--json', 'output_format', flag_value='json',
+              help="Print a machine-readable JSON report.")
+def check_dup(playlists, output_format):
+    from check_dup import _check_dup
+    _check_dup(*playlists, output_format=output_format or 'text')
 
 
 @music_helper.command()
 def archive_playlists():
+    from archive_playlists import _archive_playlists
     _archive_playlists()
 
 
 @music_helper.command()
 @click.argument('round_url', nargs=1)
 def round_result(round_url):
+    from round_result import _round_result
     _round_result(round_url)
 
 
 @music_helper.command()
 @click.argument('playlist', nargs=1)
 def shuffle_playlist(playlist):
+    from shuffle_playlist import _shuffle_playlist
     _shuffle_playlist(playlist)
 
 
+@music_helper.command()
+@click.option('--min-interval', type=float,
+              help="Seconds between polls after a change.")
+@click.option('--max-interval', type=float,
+              help="Longest wait between polls while nothing changes.")
+def watch(min_interval, max_interval):
+    from watch import _watch
+    _watch(min_interval, max_interval)
+
+
+music_helper.add_command(history)
+
+
 @music_helper.command()
 def setup():
+    from setup import setup as _setup
     _setup()
 
 
@@ -1,31 +1,114 @@
-import click
+import bisect
 import random
 
+import click
+
 from fn_helper import SpotifyClient
 
+# Playlists up to this size are rewritten with a single replace-all request
+# when that loses nothing, see `_can_replace_all`.
+REPLACE_ALL_LIMIT = 100
+
+
+def _longest_increasing_subsequence(seq):
+    """ Returns the values of a longest strictly increasing subsequence.
+    """
+    tails, tail_at, parent = [], [], [None] * len(seq)
+    for i, value in enumerate(seq):
+        k = bisect.bisect_left(tails, value)
+        if k:
+            parent[i] = tail_at[k - 1]
+        if k == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[k] = value
+            tail_at[k] = i
+    result = []
+    i = tail_at[-1] if tail_at else None
+    while i is not None:
+        result.append(seq[i])
+        i = parent[i]
+    return result[::-1]
+
+
+def plan_moves(ranks):
+    """ Plans the reorder requests turning a playlist into a new order.
+        `ranks[i]` is the new position of the track now at position i. The
+        tracks on a longest increasing subsequence stay put, the others are
+        moved right after their predecessor, contiguous runs in one request.
+        Returns a list of `(range_start, range_length, insert_before)`.
+    """
+    order = list(ranks)
+    fixed = set(_longest_increasing_subsequence(order))
+    position = {rank: i for i, rank in enumerate(order)}
+    moves = []
+    rank = 0
+    while rank < len(order):
+        if rank in fixed:
+            rank += 1
+            continue
+        start = position[rank]
+        length = 1
+        while (rank + length < len(order)
+               and rank + length not in fixed
+               and start + length < len(order)
+               and order[start + length] == rank + length):
+            length += 1
+        insert_before = position[rank - 1] + 1 if rank else 0
+        if insert_before != start:
+            moves.append((start, length, insert_before))
+            block = order[start:start + length]
+            del order[start:start + length]
+            if insert_before > start:
+                insert_before -= length
+            order[insert_before:insert_before] = block
+            lo = min(start, insert_before)
+            hi = max(start, insert_before) + length
+            for i in range(lo, hi):
+                position[order[i]] = i
+        rank += length
+    return moves
+
+
+def _can_replace_all(tracks, user_id):
+    """ Replacing the items resets their `added_by` to the current user and
+        rejects local files, so it is only used when every track is a
+        Spotify track already added by the current user.
+    """
+    return all(
+        item.get('track') and not item.get('is_local')
+        and not item['track']['uri'].startswith('spotify:local:')
+        and (item.get('added_by') or {}).get('id') == user_id
+        for item in tracks)
+
 
 def _shuffle_playlist(playlist):
-    """ Checks whether the playlist (matched by uri or name substr)
-        has any tracks already in the pool.
+    """ Shuffles the playlist (matched by uri or name substr) with as few
+        requests as possible.
     """
 
     spotify_client = SpotifyClient()
     playlist_id = spotify_client.get_playlist_id(playlist)
 
     tracks = spotify_client.all_tracks_in_playlist(playlist_id)
-    track_order = [t['track']['id'] for t in tracks if t]
-    new_track_order = [t['track']['id'] for t in tracks if t]
-    random.shuffle(new_track_order)
-    for now_at, t in enumerate(new_track_order):
-        track_was_at = track_order.index(t)
-        if now_at == track_was_at:
-            continue
+    # new_order[j] is the current position of the track that goes to j.
+    new_order = list(range(len(tracks)))
+    random.shuffle(new_order)
+
+    if (len(tracks) <= REPLACE_ALL_LIMIT
+            and _can_replace_all(tracks, spotify_client.current_user_id())):
+        spotify_client.update_playlist_tracks(
+            playlist_id, uris=[tracks[i]['track']['uri'] for i in new_order])
+        return
+
+    ranks = [0] * len(new_order)
+    for now_at, was_at in enumerate(new_order):
+        ranks[was_at] = now_at
+    for range_start, range_length, insert_before in plan_moves(ranks):
         spotify_client.update_playlist_tracks(
-            playlist_id, range_start=track_was_at, range_length=1,
-            insert_before=now_at)
-        track_order = (
-            track_order[:now_at] + [track_order[track_was_at]]
-            + track_order[now_at:track_was_at] + track_order[track_was_at+1:])
+            playlist_id, range_start=range_start, range_length=range_length,
+            insert_before=insert_before)
 
 
 @click.command()
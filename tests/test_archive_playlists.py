@@ -0,0 +1,97 @@
+import unittest
+
+from archive_playlists import ArchiveProgress, TargetWriter
+
+
+class Checkpoints(dict):
+    """ In-memory stand-in for the checkpoint shelf.
+    """
+
+    def sync(self):
+        pass
+
+
+class FakeSpotifyClient:
+    """ One target playlist. Adds fail once `fail_after` adds went through.
+    """
+
+    def __init__(self, uris=(), fail_after=None):
+        self.uris = list(uris)
+        self.fail_after = fail_after
+        self.sent = []
+
+    def iter_tracks_in_playlist(self, playlist_id):
+        for uri in self.uris:
+            yield {'track': {'uri': uri}}
+
+    def add_tracks_to_playlist(self, tracks, playlist_id):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise ValueError("500: Internal Server Error")
+        self.sent.append(list(tracks))
+        self.uris.extend(tracks)
+        return f'snapshot{len(self.sent)}'
+
+    def cache_appended_tracks(self, playlist_id, tracks, appended,
+                              snapshot_id):
+        return [{'track': {'uri': uri}} for uri in self.uris]
+
+
+def uris(start, stop):
+    return [f'spotify:track:{i}' for i in range(start, stop)]
+
+
+def archive(client, checkpoints, sources):
+    """ Writes `sources`, `[(checkpoint, track uris)]`, the way
+        ArchiveExecutor.run_recipe does.
+    """
+    progress = ArchiveProgress(checkpoints)
+    writer = TargetWriter(client, 'target', progress)
+    for seq, (checkpoint, track_uris) in enumerate(sources):
+        writer.add(track_uris, 'recipe', seq)
+        progress.source_done('recipe', seq, checkpoint)
+    writer.flush()
+
+
+class ArchiveResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.checkpoints = Checkpoints()
+        self.sources = [('round1', uris(0, 60)), ('round2', uris(60, 150))]
+
+    def test_checkpoint_advances_once_sources_are_written(self):
+        client = FakeSpotifyClient()
+        archive(client, self.checkpoints, self.sources)
+        self.assertEqual(self.checkpoints['recipe'], 'round2')
+        self.assertEqual(client.uris, uris(0, 150))
+
+    def test_crash_after_a_partial_batch_keeps_the_checkpoint(self):
+        client = FakeSpotifyClient(fail_after=1)
+        with self.assertRaises(ValueError):
+            archive(client, self.checkpoints, self.sources)
+        # The first batch of 100 covers round1 only.
+        self.assertEqual(self.checkpoints['recipe'], 'round1')
+        self.assertEqual(client.uris, uris(0, 100))
+
+        client.fail_after = None
+        archive(client, self.checkpoints, self.sources[1:])
+        self.assertEqual(self.checkpoints['recipe'], 'round2')
+        self.assertEqual(client.sent[-1], uris(100, 150))
+        self.assertEqual(client.uris, uris(0, 150))
+
+    def test_crash_before_any_write_keeps_the_checkpoint(self):
+        client = FakeSpotifyClient(fail_after=0)
+        with self.assertRaises(ValueError):
+            archive(client, self.checkpoints, self.sources[:1])
+        self.assertNotIn('recipe', self.checkpoints)
+
+    def test_rerun_sends_nothing(self):
+        client = FakeSpotifyClient()
+        archive(client, self.checkpoints, self.sources)
+        sent = len(client.sent)
+        archive(client, Checkpoints(), self.sources)
+        self.assertEqual(len(client.sent), sent)
+        self.assertEqual(client.uris, uris(0, 150))
+
+
+if __name__ == '__main__':
+    unittest.main()
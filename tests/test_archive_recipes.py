@@ -0,0 +1,51 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from archives.base import BaseArchiveRecipe, track_columns
+from archives.the_top_50s import MLTop50PercentArchiveRecipe
+from fn_helper.musicleague_util import MLTrack
+
+
+def ml_track(spotify_id, upvotes):
+    return MLTrack(
+        name=spotify_id, img_url='', artist='', submitted_by='alice',
+        link=f'https://open.spotify.com/track/{spotify_id}', comments={},
+        upvotes=upvotes)
+
+
+class TrackColumnsTest(unittest.TestCase):
+
+    def test_music_league_tracks_have_an_id(self):
+        columns = track_columns([ml_track('abc', {'bob': 3})])
+        self.assertEqual(columns['id'], ['abc'])
+        self.assertEqual(columns['score'], [3])
+
+
+class FilterTracksTest(unittest.TestCase):
+
+    def test_columns_are_only_built_for_batch_filters(self):
+        tracks = [ml_track('a', {}), ml_track('b', {})]
+        with mock.patch('archives.base.track_columns') as track_columns:
+            tags = BaseArchiveRecipe().filter_tracks(tracks, None)
+        self.assertEqual(tags, [True, True])
+        track_columns.assert_not_called()
+
+
+class TopRankersTest(unittest.TestCase):
+
+    def test_empty_round(self):
+        recipe = MLTop50PercentArchiveRecipe()
+        source = SimpleNamespace(result=SimpleNamespace(total_score=0))
+        self.assertEqual(recipe.filter_tracks([], source), [])
+
+    def test_tracks_at_or_above_the_average(self):
+        recipe = MLTop50PercentArchiveRecipe()
+        tracks = [ml_track('a', {'bob': 1}), ml_track('b', {'bob': 3})]
+        source = SimpleNamespace(result=SimpleNamespace(total_score=4))
+        self.assertEqual(recipe.filter_tracks(tracks, source),
+                         [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from check_dup import _cross_duplicates
+
+
+def submission(playlist_id, name, *tracks):
+    return {'id': playlist_id, 'name': name,
+            'entries': [{'name': track, 'track_id': track, 'isrc': None,
+                         'title_key': None} for track in tracks]}
+
+
+class CrossDuplicatesTest(unittest.TestCase):
+
+    def test_playlists_with_the_same_name_are_compared(self):
+        dups = _cross_duplicates([
+            submission('a', 'Round 1', 't1', 't2'),
+            submission('b', 'Round 1', 't2')])
+        self.assertEqual(len(dups), 1)
+        self.assertEqual(dups[0]['track'], 't2')
+        self.assertEqual(dups[0]['playlist_id'], 'b')
+        self.assertEqual(dups[0]['other_playlist_id'], 'a')
+
+    def test_repeats_within_a_playlist_are_not_reported(self):
+        self.assertEqual(
+            _cross_duplicates([submission('a', 'Round 1', 't1', 't1')]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os.path
+import tempfile
+import unittest
+from unittest import mock
+
+import history
+from fn_helper.config import config
+from fn_helper.league_history import LeagueHistory
+from fn_helper.musicleague_util import (
+    MLLeague, MLRound, MLRoundResult, MLTrack)
+
+
+def ml_round(n, fetched):
+    def parser(round_url):
+        fetched.append(round_url)
+        return MLRoundResult(title=f'Round {n}', tracks=[MLTrack(
+            name='Song', img_url='', artist='Artist', submitted_by='alice',
+            link=f'https://open.spotify.com/track/track{n}',
+            comments={'bob': 'Nice'}, upvotes={'bob': 3})])
+
+    url = f'https://app.musicleague.com/l/league/round{n}/results/'
+    return MLRound(title=f'Round {n}', playlist_link='',
+                   _result={'parser': parser, 'round_url': url},
+                   round_url=url)
+
+
+class LeagueHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'history.db')
+        patcher = mock.patch.object(config, '_data', {'HISTORY_PATH': path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.history = LeagueHistory()
+
+    def test_ingested_rounds_are_not_fetched_again(self):
+        fetched = []
+        self.assertEqual(self.history.ingest(
+            [ml_round(1, fetched), ml_round(2, fetched)]), 2)
+        self.assertEqual(self.history.ingest(
+            [ml_round(n, fetched) for n in (1, 2, 3)]), 1)
+        self.assertEqual(len(fetched), 3)
+        self.assertEqual(self.history.leaderboard(),
+                         [('alice', 9, 3, 3)])
+
+    def test_ingest_command_only_fetches_new_rounds(self):
+        fetched = []
+        self.history.ingest([ml_round(1, fetched), ml_round(2, fetched)])
+        league = MLLeague(title='League', completed_rounds=[
+            ml_round(n, fetched) for n in (1, 2, 3)])
+        client = mock.Mock(**{'parse_league.return_value': league})
+        with mock.patch('fn_helper.musicleague_util.MusicLeagueClient.shared',
+                        return_value=client), \
+                mock.patch('builtins.print'):
+            history._ingest()
+        self.assertEqual(fetched[2:], [league.completed_rounds[2].round_url])
+
+
+if __name__ == '__main__':
+    unittest.main()
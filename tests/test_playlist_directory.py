@@ -0,0 +1,70 @@
+import os.path
+import tempfile
+import unittest
+from unittest import mock
+
+from fn_helper.config import config
+from fn_helper.playlist_directory import PlaylistDirectory
+
+
+class FakeSpotifyClient:
+
+    def __init__(self, names):
+        self.playlists = [{'id': f'id{i}', 'name': name, 'snapshot_id': 's'}
+                          for i, name in enumerate(names)]
+        self.listed = 0
+
+    def playlists_page(self, offset=0, limit=50):
+        return {'total': len(self.playlists),
+                'items': self.playlists[offset:offset + limit]}
+
+    def all_playlists(self):
+        self.listed += 1
+        return list(self.playlists)
+
+
+class PlaylistDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(config, '_data', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'cache.db')
+        self.client = FakeSpotifyClient(
+            ['11/06肥宅聽歌團', 'Archive - alice', 'Archive - alice 2',
+             'Road Trip'])
+        self.directory = PlaylistDirectory(self.client, path=self.path)
+
+    def test_find_prefers_exact_then_prefix_then_substring(self):
+        self.assertEqual(
+            self.directory.find('archive - alice')['id'], 'id1')
+        self.assertEqual(self.directory.find('Road')['id'], 'id3')
+        self.assertEqual(self.directory.find('alice 2')['id'], 'id2')
+
+    def test_find_does_not_guess(self):
+        self.assertIsNone(self.directory.find('11/13肥宅聽歌團'))
+        self.assertIsNone(self.directory.find('Archive - bob'))
+        self.assertIn('11/06肥宅聽歌團',
+                      self.directory.suggest('11/13肥宅聽歌團'))
+
+    def test_renames_past_the_first_page_need_a_full_refresh(self):
+        self.directory.page_size = 1
+        self.client.playlists[3]['name'] = 'Renamed'
+        self.directory.refresh()
+        self.assertIsNone(self.directory.find('Renamed'))
+        self.directory.refresh(full=True)
+        self.assertEqual(self.directory.find('Renamed')['id'], 'id3')
+
+    def test_expired_listing_is_relisted(self):
+        listed = self.client.listed
+        self.directory.refresh()
+        self.assertEqual(self.client.listed, listed)
+        self.directory.ttl = 0
+        self.directory.refresh()
+        self.assertEqual(self.client.listed, listed + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
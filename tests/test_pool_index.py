@@ -0,0 +1,30 @@
+import unittest
+
+from fn_helper.pool_index import normalize_title
+
+
+class NormalizeTitleTest(unittest.TestCase):
+
+    def test_release_decorations_are_stripped(self):
+        for title in ('Song (Remastered 2011)', 'Song - 2011 Remaster',
+                      'Song [Deluxe Edition]', 'Song (feat. Someone)',
+                      'Song (with Someone)', 'Song - Radio Edit',
+                      'Song（Remastered）'):
+            self.assertEqual(normalize_title(title), 'song', title)
+
+    def test_live_versions_keep_their_own_key(self):
+        for title in ('Song (Live)', 'Song - Live', 'Song (Live with Band)',
+                      'Song - Live at Wembley with Orchestra',
+                      'Song - Live / Remastered 2011'):
+            self.assertNotEqual(normalize_title(title), 'song', title)
+        self.assertEqual(normalize_title('Song (Live) [Remastered]'),
+                         'song live')
+
+    def test_words_inside_the_title_are_kept(self):
+        self.assertEqual(normalize_title('Live with Me'), 'live with me')
+        self.assertEqual(normalize_title('Stay With Me (Remastered)'),
+                         'stay with me')
+
+
+if __name__ == '__main__':
+    unittest.main()
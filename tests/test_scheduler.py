@@ -0,0 +1,79 @@
+import unittest
+
+import requests
+
+from fn_helper.scheduler import RequestScheduler
+
+
+class Response:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.url = 'https://api.spotify.com/v1/playlists/id/tracks'
+        self.content = b''
+        self.headers = {}
+
+
+class FakeSession:
+    """ Answers each request with the next outcome, a status code or an
+        exception to raise.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.sent = 0
+
+    def _send(self):
+        self.sent += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Response(outcome)
+
+    def get(self, *args, **kwargs):
+        return self._send()
+
+    def post(self, *args, **kwargs):
+        return self._send()
+
+
+class RequestSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = RequestScheduler(
+            rate=1000, burst=1000, max_retries=3, backoff_base=0)
+
+    def test_idempotent_requests_retry_transient_errors(self):
+        session = FakeSession(
+            503, requests.ConnectionError(), 429, 200)
+        resp = self.scheduler.request(session.get)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(session.sent, 4)
+
+    def test_non_idempotent_requests_retry_rate_limits(self):
+        session = FakeSession(429, requests.ConnectTimeout(), 201)
+        resp = self.scheduler.request(session.post)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(session.sent, 3)
+
+    def test_non_idempotent_requests_are_not_sent_twice_after_5xx(self):
+        session = FakeSession(502, 201)
+        resp = self.scheduler.request(session.post)
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(session.sent, 1)
+
+    def test_non_idempotent_requests_are_not_sent_twice_after_a_drop(self):
+        session = FakeSession(requests.ConnectionError(), 201)
+        with self.assertRaises(requests.ConnectionError):
+            self.scheduler.request(session.post)
+        self.assertEqual(session.sent, 1)
+
+    def test_retries_run_out(self):
+        session = FakeSession(429, 429, 429, 429, 201)
+        resp = self.scheduler.request(session.post)
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(session.sent, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
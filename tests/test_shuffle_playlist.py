@@ -0,0 +1,87 @@
+import random
+import unittest
+
+from shuffle_playlist import _can_replace_all, plan_moves
+
+
+def apply_moves(items, moves):
+    """ Applies reorder requests the way the Spotify API does.
+    """
+    items = list(items)
+    for range_start, range_length, insert_before in moves:
+        block = items[range_start:range_start + range_length]
+        del items[range_start:range_start + range_length]
+        if insert_before > range_start:
+            insert_before -= range_length
+        items[insert_before:insert_before] = block
+    return items
+
+
+def ranks_of(new_order):
+    ranks = [0] * len(new_order)
+    for now_at, was_at in enumerate(new_order):
+        ranks[was_at] = now_at
+    return ranks
+
+
+class PlanMovesTest(unittest.TestCase):
+
+    def assert_reorders(self, new_order):
+        moves = plan_moves(ranks_of(new_order))
+        items = list(range(len(new_order)))
+        self.assertEqual(apply_moves(items, moves), new_order)
+        return moves
+
+    def test_empty_and_single(self):
+        self.assertEqual(self.assert_reorders([]), [])
+        self.assertEqual(self.assert_reorders([0]), [])
+
+    def test_identity_needs_no_moves(self):
+        self.assertEqual(self.assert_reorders(list(range(10))), [])
+
+    def test_reversed(self):
+        moves = self.assert_reorders(list(range(10))[::-1])
+        self.assertEqual(len(moves), 9)
+
+    def test_single_track_moved(self):
+        moves = self.assert_reorders([1, 2, 3, 4, 0])
+        self.assertEqual(len(moves), 1)
+
+    def test_contiguous_run_moved_in_one_request(self):
+        moves = self.assert_reorders([3, 4, 5, 0, 1, 2])
+        self.assertEqual(len(moves), 1)
+
+    def test_random_orders(self):
+        rng = random.Random(0)
+        for size in (2, 3, 5, 17, 100, 250):
+            for _ in range(20):
+                new_order = list(range(size))
+                rng.shuffle(new_order)
+                moves = self.assert_reorders(new_order)
+                self.assertLess(len(moves), size)
+
+
+class CanReplaceAllTest(unittest.TestCase):
+
+    def item(self, uri='spotify:track:a', added_by='me', is_local=False):
+        return {'added_by': {'id': added_by}, 'is_local': is_local,
+                'track': {'uri': uri}}
+
+    def test_own_spotify_tracks(self):
+        self.assertTrue(_can_replace_all([self.item(), self.item()], 'me'))
+
+    def test_tracks_added_by_others(self):
+        self.assertFalse(_can_replace_all(
+            [self.item(), self.item(added_by='bob')], 'me'))
+
+    def test_local_tracks(self):
+        self.assertFalse(_can_replace_all(
+            [self.item(uri='spotify:local:a:b:c:1', is_local=True)], 'me'))
+
+    def test_unavailable_tracks(self):
+        self.assertFalse(_can_replace_all(
+            [{'added_by': {'id': 'me'}, 'track': None}], 'me'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+from fn_helper import MLRoundIterator
+from watch import Watcher
+
+
+class Recipe:
+    source_factory = MLRoundIterator
+
+
+class WatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        with mock.patch('watch.load_recipes', return_value=[]):
+            self.watcher = Watcher(
+                spotify_client=object(), min_interval=1, max_interval=10)
+        self.watcher.source_factories = {MLRoundIterator}
+        self.rounds = ('round-1',)
+        patcher = mock.patch.object(
+            Watcher, 'league_fingerprint', lambda _: self.rounds)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_once(self, failures):
+        with mock.patch('watch._archive_playlists',
+                        return_value=failures) as archive:
+            self.watcher.run_once()
+        return archive.call_count
+
+    def test_unchanged_sources_are_not_archived(self):
+        self.assertEqual(self.run_once({}), 1)
+        self.assertEqual(self.run_once({}), 0)
+
+    def test_failed_sources_are_archived_again(self):
+        self.assertEqual(self.run_once({Recipe(): ValueError('500')}), 1)
+        self.assertEqual(self.run_once({}), 1)
+        self.assertEqual(self.run_once({}), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import time
+
+import click
+
+from archive_playlists import _archive_playlists
+from archives import load_recipes
+from fn_helper import (
+    config, MLRoundIterator, MusicLeagueClient, SpotifyClient,
+    SpotifyNerdPlaylistIterator)
+from fn_helper.playlist_directory import PlaylistDirectory
+
+
+class Watcher:
+    """ Polls the sources of the active recipes and archives a source only
+        once new rounds were completed or new playlists were created. Clients,
+        tokens and caches stay warm between polls. The polling interval backs
+        off while nothing changes and resets after a change.
+    """
+    backoff = 1.5
+
+    def __init__(self, spotify_client=None, min_interval=None,
+                 max_interval=None):
+        self.spotify_client = spotify_client or SpotifyClient()
+        self.min_interval = min_interval or config.get(
+            'WATCH_MIN_INTERVAL', 60)
+        self.max_interval = max_interval or config.get(
+            'WATCH_MAX_INTERVAL', 900)
+        self.interval = self.min_interval
+        self.source_factories = {
+            Recipe.source_factory for Recipe in load_recipes()
+            if Recipe.active}
+        self.fingerprints = {}
+
+    def league_fingerprint(self):
+        """ Completed rounds, revalidating the league page with its ETag.
+        """
+        league = MusicLeagueClient.shared().parse_league(ttl=0)
+        return tuple(r.round_url for r in league.completed_rounds)
+
+    def playlists_fingerprint(self):
+        """ Nerd playlists, relisting the playlists only when the first page
+            of snapshot IDs changed or the saved listing expired.
+        """
+        directory = PlaylistDirectory.shared(self.spotify_client)
+        directory.refresh()
+        return frozenset(
+            p['id'] for p in directory.playlists
+            if SpotifyNerdPlaylistIterator.is_nerd_playlist(p['name']))
+
+    def poll(self):
+        """ Returns the source factories whose fingerprint changed since the
+            last archived one, mapped to their new fingerprint. Every source
+            is considered changed on the first poll, and sources that cannot
+            be fingerprinted (mapped to None) on every poll.
+        """
+        fingerprints = {
+            MLRoundIterator: self.league_fingerprint,
+            SpotifyNerdPlaylistIterator: self.playlists_fingerprint,
+        }
+        changed = {}
+        for factory in self.source_factories:
+            if factory not in fingerprints:
+                changed[factory] = None
+                continue
+            fingerprint = fingerprints[factory]()
+            if self.fingerprints.get(factory) != fingerprint:
+                changed[factory] = fingerprint
+        return changed
+
+    def run_once(self):
+        """ Polls once and archives the changed sources, returning the number
+            of seconds to wait before the next poll. A fingerprint is only
+            kept once its sources were archived, so failed sources are
+            archived again on the next poll.
+        """
+        changed = self.poll()
+        if changed:
+            names = ", ".join(sorted(f.__name__ for f in changed))
+            print(f"Changes detected in {names}, archiving.")
+            failures = _archive_playlists(
+                self.spotify_client, source_factories=set(changed))
+            failed = {recipe.source_factory for recipe in failures}
+            for factory, fingerprint in changed.items():
+                if fingerprint is not None and factory not in failed:
+                    self.fingerprints[factory] = fingerprint
+            self.interval = self.min_interval
+        else:
+            self.interval = min(
+                self.interval * self.backoff, self.max_interval)
+        return self.interval
+
+    def run(self):
+        while True:
+            try:
+                interval = self.run_once()
+            except Exception as e:
+                # Network hiccups must not stop the daemon, retry soon.
+                print(f"Poll failed: {e}")
+                interval = self.min_interval
+            time.sleep(interval)
+
+
+def _watch(min_interval=None, max_interval=None):
+    Watcher(min_interval=min_interval, max_interval=max_interval).run()
+
+
+@click.command()
+@click.option('--min-interval', type=float,
+              help="Seconds between polls after a change.")
+@click.option('--max-interval', type=float,
+              help="Longest wait between polls while nothing changes.")
+def watch(min_interval, max_interval):
+    _watch(min_interval, max_interval)
+
+
+if __name__ == '__main__':
+    watch()